@@ -0,0 +1,136 @@
+"""Transport overhead of the MCP servers, separate from business logic.
+
+Operations: ping round trip, accounts tool call (get_balance), resource read (strategy).
+Transports:
+    stdio-cold   launch a server process per call (what accounts_client.py does by default)
+    http-new     new connection and session per call to the warm mcp_host.py process
+    http-warm    one long-lived session to the warm host
+
+usage: python benchmark_mcp.py --iterations 20 [--json results.json]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+from contextlib import asynccontextmanager
+
+import mcp
+from mcp import StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+from mcp_host import app_url
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ACCOUNT = "bench"
+
+OPERATIONS = {
+    "ping": ("ping", lambda s: s.call_tool("ping", {})),
+    "tool_call": ("accounts", lambda s: s.call_tool("get_balance", {"name": ACCOUNT})),
+    "resource_read": ("accounts", lambda s: s.read_resource(f"accounts://strategy/{ACCOUNT}")),
+}
+
+
+@asynccontextmanager
+async def stdio_session(app, workdir):
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    params = StdioServerParameters(command=sys.executable, args=[os.path.join(ROOT, "mcp_host.py"), "--stdio", app],
+                                   env=env, cwd=workdir)
+    async with stdio_client(params) as streams:
+        async with mcp.ClientSession(*streams) as session:
+            await session.initialize()
+            yield session
+
+
+@asynccontextmanager
+async def http_session(app, port):
+    async with streamablehttp_client(app_url(app, port=port)) as (read, write, _):
+        async with mcp.ClientSession(read, write) as session:
+            await session.initialize()
+            yield session
+
+
+def start_host(port, workdir):
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    host = subprocess.Popen([sys.executable, os.path.join(ROOT, "mcp_host.py"), "--port", str(port)],
+                            cwd=workdir, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return host
+        except OSError:
+            time.sleep(0.1)
+    host.kill()
+    raise RuntimeError("mcp_host.py did not start")
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000,
+    }
+
+
+async def timed(call):
+    start = time.perf_counter()
+    await call()
+    return time.perf_counter() - start
+
+
+async def run(iterations, port, workdir):
+    results = {}
+    for op, (app, call) in OPERATIONS.items():
+        async def stdio_cold():
+            async with stdio_session(app, workdir) as session:
+                await call(session)
+
+        async def http_new():
+            async with http_session(app, port) as session:
+                await call(session)
+
+        results[f"stdio-cold/{op}"] = summarize([await timed(stdio_cold) for _ in range(iterations)])
+        results[f"http-new/{op}"] = summarize([await timed(http_new) for _ in range(iterations)])
+        async with http_session(app, port) as session:
+            await call(session)  # warm-up
+            results[f"http-warm/{op}"] = summarize(
+                [await timed(lambda: call(session)) for _ in range(iterations)]
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    # the accounts server creates accounts.db in its working directory, keep it out of the repo
+    with tempfile.TemporaryDirectory() as workdir:
+        host = start_host(args.port, workdir)
+        try:
+            results = asyncio.run(run(args.iterations, args.port, workdir))
+        finally:
+            host.terminate()
+            host.wait()
+
+    print(f"{'scenario':<28}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<28}{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
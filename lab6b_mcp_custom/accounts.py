@@ -1,10 +1,13 @@
-from pydantic import BaseModel
-import json
+from pydantic import BaseModel, ConfigDict
+import orjson
 from dotenv import load_dotenv
 from datetime import datetime
+from operator import mul
 from .market import get_share_price
 from .database import write_account, read_account, write_log
 import sys
+import time
+import calendar
 
 
 load_dotenv(override=True)
@@ -15,6 +18,16 @@ def _log(msg: str) -> None:
 
 INITIAL_BALANCE = 10_000.0
 SPREAD = 0.002
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+# the naive timestamp strings are read as UTC, so the round trip is exact whatever the server's timezone
+def to_epoch(timestamp: str) -> int:
+    return calendar.timegm(time.strptime(timestamp, TIMESTAMP_FORMAT))
+
+
+def from_epoch(epoch: int) -> str:
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(epoch))
 
 
 class Transaction(BaseModel):
@@ -31,39 +44,163 @@ class Transaction(BaseModel):
         return f"{abs(self.quantity)} shares of {self.symbol} at {self.price} each."
 
 
+class _Columns:
+    """ Parallel arrays stored as one orjson blob, only decoded on first access. """
+    FIELDS: tuple[str, ...] = ()
+    __slots__ = ("_raw", "_columns")
+
+    def __init__(self, raw: bytes | None = None):
+        self._raw = raw
+        self._columns = None
+
+    @property
+    def columns(self) -> dict[str, list]:
+        if self._columns is None:
+            self._columns = self._decode(self._raw) if self._raw else {field: [] for field in self.FIELDS}
+            self._raw = None
+        return self._columns
+
+    def _decode(self, raw: bytes) -> dict[str, list]:
+        return orjson.loads(raw)
+
+    def dumps(self) -> bytes:
+        # untouched history is written back as is, without decoding it
+        if self._columns is None and self._raw:
+            return self._raw
+        return orjson.dumps(self.columns)
+
+    def __len__(self) -> int:
+        return len(self.columns[self.FIELDS[0]])
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self)!r})"
+
+
+class TransactionLog(_Columns):
+    """ Transactions as parallel arrays with epoch timestamps and interned symbols. """
+    FIELDS = ("symbol", "quantity", "price", "timestamp", "rationale")
+    __slots__ = ()
+
+    @classmethod
+    def from_records(cls, records: list[dict]) -> "TransactionLog":
+        log = cls()
+        for record in records:
+            log.append(Transaction(**record))
+        return log
+
+    def _decode(self, raw: bytes) -> dict[str, list]:
+        columns = orjson.loads(raw)
+        columns["symbol"] = [sys.intern(symbol) for symbol in columns["symbol"]]
+        return columns
+
+    def append(self, transaction: Transaction) -> None:
+        columns = self.columns
+        columns["symbol"].append(sys.intern(transaction.symbol))
+        columns["quantity"].append(transaction.quantity)
+        columns["price"].append(transaction.price)
+        columns["timestamp"].append(to_epoch(transaction.timestamp))
+        columns["rationale"].append(transaction.rationale)
+
+    def __getitem__(self, i: int) -> Transaction:
+        c = self.columns
+        return Transaction.model_construct(symbol=c["symbol"][i], quantity=c["quantity"][i], price=c["price"][i],
+                                           timestamp=from_epoch(c["timestamp"][i]), rationale=c["rationale"][i])
+
+    def total_spend(self) -> float:
+        c = self.columns
+        return sum(map(mul, c["quantity"], c["price"]))
+
+    def to_list(self) -> list[dict]:
+        c = self.columns
+        return [
+            {"symbol": s, "quantity": q, "price": p, "timestamp": from_epoch(t), "rationale": r}
+            for s, q, p, t, r in zip(c["symbol"], c["quantity"], c["price"], c["timestamp"], c["rationale"])
+        ]
+
+
+class TimeSeries(_Columns):
+    """ Portfolio value history as parallel arrays with epoch timestamps. """
+    FIELDS = ("timestamp", "value")
+    __slots__ = ()
+
+    @classmethod
+    def from_records(cls, records: list) -> "TimeSeries":
+        series = cls()
+        for timestamp, value in records:
+            series.append((timestamp, value))
+        return series
+
+    def append(self, point: tuple[str, float]) -> None:
+        columns = self.columns
+        columns["timestamp"].append(to_epoch(point[0]))
+        columns["value"].append(point[1])
+
+    def __getitem__(self, i: int) -> tuple[str, float]:
+        c = self.columns
+        return from_epoch(c["timestamp"][i]), c["value"][i]
+
+    def to_list(self) -> list[tuple[str, float]]:
+        c = self.columns
+        return [(from_epoch(t), v) for t, v in zip(c["timestamp"], c["value"])]
+
+
 class Account(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     name: str
     balance: float
     strategy: str
     holdings: dict[str, int]
-    transactions: list[Transaction]
-    portfolio_value_time_series: list[tuple[str, float]]
+    transactions: TransactionLog
+    portfolio_value_time_series: TimeSeries
 
     @classmethod
     def get(cls, name: str):
-        fields = read_account(name.lower())
-        if not fields:
-            fields = {
-                "name": name.lower(),
-                "balance": INITIAL_BALANCE,
-                "strategy": "",
-                "holdings": {},
-                "transactions": [],
-                "portfolio_value_time_series": []
-            }
-            write_account(name, fields)
-        return cls(**fields)
-    
-    
+        row = read_account(name.lower())
+        if not row:
+            account = cls.model_construct(
+                name=name.lower(),
+                balance=INITIAL_BALANCE,
+                strategy="",
+                holdings={},
+                transactions=TransactionLog(),
+                portfolio_value_time_series=TimeSeries(),
+            )
+            account.save()
+            return account
+        fields, transactions, time_series = row
+        if transactions is None:
+            # row saved in the old json format, converted on the next save
+            transactions = TransactionLog.from_records(fields.pop("transactions"))
+            time_series = TimeSeries.from_records(fields.pop("portfolio_value_time_series"))
+            return cls.model_construct(**fields, transactions=transactions, portfolio_value_time_series=time_series)
+        # our own data: skip validation, transactions are decoded only when used
+        return cls.model_construct(**fields, transactions=TransactionLog(transactions),
+                                   portfolio_value_time_series=TimeSeries(time_series))
+
+    def header(self) -> dict:
+        return {"name": self.name, "balance": self.balance, "strategy": self.strategy, "holdings": self.holdings}
+
+    def to_dict(self) -> dict:
+        """ Same shape as the json the account was stored as before. """
+        data = self.header()
+        data["transactions"] = self.transactions.to_list()
+        data["portfolio_value_time_series"] = self.portfolio_value_time_series.to_list()
+        return data
+
     def save(self):
-        write_account(self.name.lower(), self.model_dump())
+        write_account(self.name.lower(), self.header(), self.transactions.dumps(),
+                      self.portfolio_value_time_series.dumps())
 
     def reset(self, strategy: str):
         self.balance = INITIAL_BALANCE
         self.strategy = strategy
         self.holdings = {}
-        self.transactions = []
-        self.portfolio_value_time_series = []
+        self.transactions = TransactionLog()
+        self.portfolio_value_time_series = TimeSeries()
         self.save()
 
     def deposit(self, amount: float):
@@ -141,7 +278,7 @@ class Account(BaseModel):
 
     def calculate_profit_loss(self, portfolio_value: float):
         """ Calculate profit or loss from the initial spend. """
-        initial_spend = sum(transaction.total() for transaction in self.transactions)
+        initial_spend = self.transactions.total_spend()
         return portfolio_value - initial_spend - self.balance
 
     def get_holdings(self):
@@ -154,7 +291,7 @@ class Account(BaseModel):
 
     def list_transactions(self):
         """ List all transactions made by the user. """
-        return [transaction.model_dump() for transaction in self.transactions]
+        return self.transactions.to_list()
     
     def report(self) -> str:
         """ Return a json string representing the account.  """
@@ -162,11 +299,11 @@ class Account(BaseModel):
         self.portfolio_value_time_series.append((datetime.now().strftime("%Y-%m-%d %H:%M:%S"), portfolio_value))
         self.save()
         pnl = self.calculate_profit_loss(portfolio_value)
-        data = self.model_dump()
+        data = self.to_dict()
         data["total_portfolio_value"] = portfolio_value
         data["total_profit_loss"] = pnl
         write_log(self.name, "account", f"Retrieved account details")
-        return json.dumps(data)
+        return orjson.dumps(data).decode()
     
     def get_strategy(self) -> str:
         """ Return the strategy of the account """
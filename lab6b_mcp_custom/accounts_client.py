@@ -1,39 +1,48 @@
 import mcp
 from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
 from mcp import StdioServerParameters
 from agents import FunctionTool
+from contextlib import asynccontextmanager
 import os
 import json
 
 params = StdioServerParameters(command="uv", args=["run", "accounts_server.py"], env=dict(os.environ))
+# set to the warm host's url (python mcp_host.py -> http://127.0.0.1:8765/accounts/mcp) to skip launching a server per call
+accounts_url = os.getenv("ACCOUNTS_MCP_URL")
+
+@asynccontextmanager
+async def accounts_session():
+    if accounts_url:
+        async with streamablehttp_client(accounts_url) as (read, write, _):
+            async with mcp.ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+    else:
+        async with stdio_client(params) as streams:
+            async with mcp.ClientSession(*streams) as session:
+                await session.initialize()
+                yield session
 
 async def list_accounts_tools():
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            tools_result = await session.list_tools()
-            return tools_result.tools
+    async with accounts_session() as session:
+        tools_result = await session.list_tools()
+        return tools_result.tools
         
 async def call_accounts_tool(tool_name, tool_args):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.call_tool(tool_name, tool_args)
-            return result
+    async with accounts_session() as session:
+        result = await session.call_tool(tool_name, tool_args)
+        return result
             
 async def read_accounts_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://accounts_server/{name}")
-            return result.contents[0].text
+    async with accounts_session() as session:
+        result = await session.read_resource(f"accounts://accounts_server/{name}")
+        return result.contents[0].text
         
 async def read_strategy_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://strategy/{name}")
-            return result.contents[0].text
+    async with accounts_session() as session:
+        result = await session.read_resource(f"accounts://strategy/{name}")
+        return result.contents[0].text
 
 async def get_accounts_tools_openai():
     openai_tools = []
@@ -23,7 +23,7 @@ async def get_holdings(name: str) -> dict[str, int]:
     return Account.get(name).holdings
 
 @mcp.tool()
-async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> float:
+async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> str:
     """Buy shares of a stock
     Args: 
         name: name of account holder
@@ -34,7 +34,7 @@ async def buy_shares(name: str, symbol: str, quantity: int, rationale: str) -> f
     return Account.get(name).buy_shares(symbol, quantity, rationale)
 
 @mcp.tool()
-async def sell_shares(name: str, symbol: str, quantity: int, rationale: str) -> float:
+async def sell_shares(name: str, symbol: str, quantity: int, rationale: str) -> str:
     """Sell a share of a stock
     
     Args: 
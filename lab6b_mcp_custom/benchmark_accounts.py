@@ -0,0 +1,155 @@
+"""Load/save cost of an Account against the length of its trading history.
+
+Compares the column storage (orjson blobs, lazy decoding) with the previous format, where the whole
+account was one json document validated by pydantic on every load.
+
+    python -m lab6b_mcp_custom.benchmark_accounts --lengths 100 1000 10000 50000 [--json results.json]
+"""
+import os
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+
+from pydantic import BaseModel
+
+from . import database
+from .accounts import Account, Transaction, TransactionLog, TimeSeries, from_epoch
+
+SYMBOLS = ["AAPL", "MSFT", "AMZN", "GOOGL", "NVDA", "META", "TSLA", "JPM", "V", "XOM"]
+
+
+class LegacyAccount(BaseModel):
+    """the account model as it was stored before, for the baseline"""
+    name: str
+    balance: float
+    strategy: str
+    holdings: dict[str, int]
+    transactions: list[Transaction]
+    portfolio_value_time_series: list[tuple[str, float]]
+
+
+def legacy_save(account: LegacyAccount):
+    with sqlite3.connect(database.DB) as conn:
+        conn.execute("INSERT OR REPLACE INTO legacy (name, account) VALUES (?, ?)",
+                     (account.name, json.dumps(account.model_dump())))
+
+
+def legacy_load(name: str) -> LegacyAccount:
+    with sqlite3.connect(database.DB) as conn:
+        row = conn.execute("SELECT account FROM legacy WHERE name = ?", (name,)).fetchone()
+    return LegacyAccount(**json.loads(row[0]))
+
+
+def make_history(length: int) -> dict:
+    start = int(time.time()) - length * 60
+    transactions = [
+        {"symbol": random.choice(SYMBOLS), "quantity": random.choice([-5, -1, 1, 2, 10]),
+         "price": round(random.uniform(10, 500), 2), "timestamp": from_epoch(start + i * 60),
+         "rationale": "Momentum after earnings beat, adding to the position"}
+        for i in range(length)
+    ]
+    series = [(from_epoch(start + i * 60), 10_000 + random.uniform(-500, 500)) for i in range(length)]
+    return {"name": f"bench{length}", "balance": 10_000.0, "strategy": "benchmark",
+            "holdings": {symbol: 10 for symbol in SYMBOLS},
+            "transactions": transactions, "portfolio_value_time_series": series}
+
+
+def timed(fn, repeat: int) -> float:
+    """median milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def peak_kb(fn) -> float:
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak / 1024
+
+
+def stored_bytes(table: str, name: str) -> int:
+    with sqlite3.connect(database.DB) as conn:
+        if table == "legacy":
+            row = conn.execute("SELECT length(account) FROM legacy WHERE name = ?", (name,)).fetchone()
+        else:
+            row = conn.execute("SELECT length(account) + length(transactions) + length(time_series) "
+                               "FROM accounts WHERE name = ?", (name,)).fetchone()
+    return row[0]
+
+
+def bench(length: int, repeat: int) -> dict:
+    history = make_history(length)
+    name = history["name"]
+
+    legacy = LegacyAccount(**history)
+    legacy_save(legacy)
+    account = Account.model_construct(
+        name=name, balance=history["balance"], strategy=history["strategy"], holdings=history["holdings"],
+        transactions=TransactionLog.from_records(history["transactions"]),
+        portfolio_value_time_series=TimeSeries.from_records(history["portfolio_value_time_series"]),
+    )
+    account.save()
+
+    def load_and_read():
+        loaded = Account.get(name)
+        loaded.list_transactions()
+        return loaded
+
+    return {
+        "length": length,
+        "legacy_load_ms": timed(lambda: legacy_load(name), repeat),
+        "legacy_save_ms": timed(lambda: legacy_save(legacy), repeat),
+        "legacy_load_peak_kb": peak_kb(lambda: legacy_load(name)),
+        "legacy_stored_kb": stored_bytes("legacy", name) / 1024,
+        "load_ms": timed(lambda: Account.get(name), repeat),
+        "load_read_ms": timed(load_and_read, repeat),
+        "save_ms": timed(account.save, repeat),
+        "load_peak_kb": peak_kb(lambda: Account.get(name)),
+        "load_read_peak_kb": peak_kb(load_and_read),
+        "stored_kb": stored_bytes("accounts", name) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database.DB = os.path.join(workdir, "accounts.db")
+        database.init_db()
+        with sqlite3.connect(database.DB) as conn:
+            conn.execute("CREATE TABLE legacy (name TEXT PRIMARY KEY, account TEXT)")
+        results = [bench(length, args.repeat) for length in args.lengths]
+
+    columns = [("length", "length", "{:>8}"),
+               ("legacy_load_ms", "old load", "{:>10.2f}"), ("load_ms", "load", "{:>10.2f}"),
+               ("load_read_ms", "load+read", "{:>10.2f}"),
+               ("legacy_save_ms", "old save", "{:>10.2f}"), ("save_ms", "save", "{:>10.2f}"),
+               ("legacy_load_peak_kb", "old KB", "{:>10.0f}"), ("load_peak_kb", "KB", "{:>10.0f}"),
+               ("load_read_peak_kb", "read KB", "{:>10.0f}"),
+               ("legacy_stored_kb", "old disk", "{:>10.0f}"), ("stored_kb", "disk", "{:>10.0f}")]
+    print("".join(f"{title:>{8 if key == 'length' else 10}}" for key, title, _ in columns)
+          + "   (times are median ms, KB is peak traced allocation)")
+    for r in results:
+        print("".join(fmt.format(r[key]) for key, _, fmt in columns))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
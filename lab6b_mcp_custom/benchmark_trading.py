@@ -0,0 +1,316 @@
+"""Throughput, latency and profiles of the trading stack, fully offline.
+
+Prices come from a deterministic stub instead of polygon, and every run uses a fresh temporary database.
+Scenarios drive Account directly, the way accounts_server.py does, and through a real MCP client session
+to accounts_server over stdio. Each scenario gets a cProfile dump (open with snakeviz, or turn it into a
+flamegraph with flameprof) and a text summary, and all numbers are saved as JSON to compare revisions.
+
+    python -m lab6b_mcp_custom.benchmark_trading --iterations 500 --out bench_results
+    python -m lab6b_mcp_custom.benchmark_trading --compare bench_results/old.json bench_results/results.json
+"""
+import os
+import sys
+import json
+import time
+import pstats
+import asyncio
+import cProfile
+import argparse
+import platform
+import tempfile
+import subprocess
+import statistics
+import zlib
+
+import mcp
+from mcp import StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+from . import accounts, database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SYMBOLS = ["AAPL", "MSFT", "AMZN", "GOOGL", "NVDA", "META", "TSLA", "JPM", "V", "XOM"]
+RATIONALE = "Benchmark trade, fits the strategy"
+WARMUP = 5
+
+# where a buy_shares call spends its time: (label, file suffix, function name), cumulative time
+BREAKDOWN = [
+    ("pricing", "benchmark_trading.py", "stub_share_price"),
+    ("load", "accounts.py", "get"),
+    ("save", "accounts.py", "save"),
+    ("sqlite_read", "database.py", "read_account"),
+    ("sqlite_write", "database.py", "write_account"),
+    ("logging", "database.py", "write_log"),
+    ("encode", "accounts.py", "dumps"),
+    ("decode", "accounts.py", "columns"),
+]
+
+price_latency = 0.0
+
+
+def stub_share_price(symbol: str) -> float:
+    """stable price per symbol with a small drift, optionally as slow as a real provider"""
+    if price_latency:
+        time.sleep(price_latency)
+    base = zlib.crc32(symbol.encode()) % 400 + 20
+    return round(base * (1 + (time.perf_counter_ns() % 1000 - 500) / 100_000), 2)
+
+
+def use_stub_prices(latency_ms: float = 0.0) -> None:
+    global price_latency
+    price_latency = latency_ms / 1000
+    # accounts.py imported the function by name, so that is the reference to replace
+    accounts.get_share_price = stub_share_price
+
+
+def use_temp_db(workdir: str) -> None:
+    # the environment variable carries the path to the mcp server processes
+    database.DB = os.environ["ACCOUNTS_DB"] = os.path.join(workdir, "accounts.db")
+    database.init_db()
+
+
+def summarize(samples: list[float], elapsed: float) -> dict:
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(int(len(ordered) * p), len(ordered) - 1)] * 1000
+
+    return {
+        "n": len(ordered),
+        "throughput_per_s": len(ordered) / elapsed,
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def breakdown(stats: pstats.Stats, calls: int) -> dict:
+    """cumulative ms per call of the interesting functions"""
+    result = {}
+    for label, suffix, function in BREAKDOWN:
+        total = sum(ct for (filename, _, name), (_, _, _, ct, _) in stats.stats.items()
+                    if name == function and filename.endswith(suffix))
+        result[label] = total * 1000 / calls
+    return result
+
+
+def write_profile(profiler: cProfile.Profile, path: str, calls: int) -> dict:
+    profiler.dump_stats(path + ".prof")
+    return write_profile_summary(path, calls)
+
+
+def write_profile_summary(path: str, calls: int) -> dict:
+    stats = pstats.Stats(path + ".prof")
+    with open(path + ".txt", "w") as f:
+        stats.stream = f
+        stats.sort_stats("cumulative").print_stats(30)
+    return breakdown(stats, calls)
+
+
+# direct scenarios: one call on an Account, the same work an accounts_server tool does
+
+def trade(i: int, name: str) -> None:
+    account = accounts.Account.get(name)
+    symbol = SYMBOLS[i % len(SYMBOLS)]
+    if i % 4 == 3 and account.holdings.get(symbol):
+        account.sell_shares(symbol, 1, RATIONALE)
+    else:
+        account.buy_shares(symbol, 1, RATIONALE)
+
+
+DIRECT = {
+    "buy_shares": lambda i, name: accounts.Account.get(name).buy_shares(SYMBOLS[i % len(SYMBOLS)], 1, RATIONALE),
+    "trade_mix": trade,
+    "get_balance": lambda i, name: accounts.Account.get(name).balance,
+    "report": lambda i, name: accounts.Account.get(name).report(),
+    "list_transactions": lambda i, name: accounts.Account.get(name).list_transactions(),
+}
+
+
+def seed(name: str, trades: int) -> None:
+    """history for the read scenarios, so they do not read an empty account"""
+    account = accounts.Account.get(name)
+    account.reset("benchmark")
+    account.balance = 1e12
+    for i in range(trades):
+        account.buy_shares(SYMBOLS[i % len(SYMBOLS)], 1, RATIONALE)
+
+
+def run_direct(scenario: str, iterations: int, history: int, out: str, profile: bool) -> dict:
+    call = DIRECT[scenario]
+    name = f"direct_{scenario}"
+    seed(name, history)
+    for i in range(WARMUP):
+        call(i, name)
+    samples = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t = time.perf_counter()
+        call(i, name)
+        samples.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    result = summarize(samples, elapsed)
+    if profile:
+        # a separate pass, so the profiler overhead stays out of the latencies
+        seed(name, history)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        for i in range(iterations):
+            call(i, name)
+        profiler.disable()
+        result["breakdown_ms"] = write_profile(profiler, os.path.join(out, f"direct_{scenario}"), iterations)
+    return result
+
+
+# mcp scenarios: a real client session to accounts_server running in its own process
+
+MCP = {
+    "buy_shares": lambda s, i, name: s.call_tool(
+        "buy_shares", {"name": name, "symbol": SYMBOLS[i % len(SYMBOLS)], "quantity": 1, "rationale": RATIONALE}),
+    "get_balance": lambda s, i, name: s.call_tool("get_balance", {"name": name}),
+    "get_holdings": lambda s, i, name: s.call_tool("get_holdings", {"name": name}),
+    "read_strategy": lambda s, i, name: s.read_resource(f"accounts://strategy/{name}"),
+}
+
+
+async def run_mcp(scenario: str, iterations: int, history: int, out: str, workdir: str, latency_ms: float,
+                  profile: bool) -> dict:
+    call = MCP[scenario]
+    name = f"mcp_{scenario}"
+    seed(name, history)  # same database file as the server, through ACCOUNTS_DB
+    path = os.path.join(out, f"mcp_{scenario}")
+    args = ["-m", "lab6b_mcp_custom.benchmark_trading", "--serve", "--price-latency-ms", str(latency_ms)]
+    if profile:
+        args += ["--profile", path + ".prof"]
+    params = StdioServerParameters(command=sys.executable, args=args, cwd=workdir,
+                                   env={**os.environ, "PYTHONPATH": ROOT})
+    with open(path + ".log", "w") as errlog:  # the server logs every request on stderr
+        async with stdio_client(params, errlog=errlog) as streams:
+            async with mcp.ClientSession(*streams) as session:
+                await session.initialize()
+                for i in range(WARMUP):
+                    await call(session, i, name)
+                samples = []
+                start = time.perf_counter()
+                for i in range(iterations):
+                    t = time.perf_counter()
+                    result = await call(session, i, name)
+                    samples.append(time.perf_counter() - t)
+                    if getattr(result, "isError", False):
+                        raise RuntimeError(f"{scenario} failed: {result.content}")
+                elapsed = time.perf_counter() - start
+    result = summarize(samples, elapsed)
+    if profile:
+        # the server writes its profile when the session closes, warm-up calls included
+        result["breakdown_ms"] = write_profile_summary(path, iterations + WARMUP)
+    return result
+
+
+def serve(profile_path: str | None, latency_ms: float) -> None:
+    """accounts_server over stdio with stub prices, profiled for its whole lifetime if asked to"""
+    from .accounts_server import mcp as server
+    use_stub_prices(latency_ms)
+    if not profile_path:
+        server.run(transport="stdio")
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        server.run(transport="stdio")
+    finally:
+        profiler.disable()
+        profiler.dump_stats(profile_path)
+
+
+def revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def print_results(results: dict) -> None:
+    print(f"{'scenario':<26}{'ops/s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<26}{r['throughput_per_s']:>10.1f}{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}"
+              f"{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+    for name, r in results.items():
+        if "breakdown_ms" not in r:
+            continue
+        parts = ", ".join(f"{label} {ms:.2f}" for label, ms in r["breakdown_ms"].items() if ms)
+        print(f"{name}: {parts} (ms per call)")
+
+
+def compare(old_path: str, new_path: str) -> None:
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['meta']['revision'] or old_path} -> {new['meta']['revision'] or new_path}")
+    print(f"{'scenario':<26}{'ops/s':>18}{'p50 ms':>18}{'p95 ms':>18}")
+    for name, r in new["scenarios"].items():
+        before = old["scenarios"].get(name)
+        if before is None:
+            continue
+        cells = [f"{before[key]:.1f}->{r[key]:.1f}" for key in ("throughput_per_s", "p50_ms", "p95_ms")]
+        print(f"{name:<26}" + "".join(f"{cell:>18}" for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="offline benchmark of the accounts trading stack")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--history", type=int, default=500, help="trades already on each account")
+    parser.add_argument("--price-latency-ms", type=float, default=0.0, help="simulated price provider latency")
+    parser.add_argument("--scenarios", nargs="+", help="e.g. direct/buy_shares mcp/get_balance, default all")
+    parser.add_argument("--out", default="bench_results", help="directory for profiles and results.json")
+    parser.add_argument("--no-profile", action="store_true",
+                        help="skip the profiles; the mcp server otherwise runs under cProfile for the whole scenario")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--profile", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.profile, args.price_latency_ms)
+        return
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    selected = args.scenarios or [f"direct/{s}" for s in DIRECT] + [f"mcp/{s}" for s in MCP]
+    out = os.path.abspath(args.out)
+    os.makedirs(out, exist_ok=True)
+    use_stub_prices(args.price_latency_ms)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        use_temp_db(workdir)
+        for scenario in selected:
+            kind, name = scenario.split("/")
+            print(f"running {scenario}...", file=sys.stderr)
+            if kind == "direct":
+                results[scenario] = run_direct(name, args.iterations, args.history, out, not args.no_profile)
+            else:
+                results[scenario] = asyncio.run(run_mcp(name, args.iterations, args.history, out, workdir,
+                                                        args.price_latency_ms, not args.no_profile))
+
+    print_results(results)
+    meta = {
+        "revision": revision(),
+        "python": platform.python_version(),
+        "iterations": args.iterations,
+        "history": args.history,
+        "price_latency_ms": args.price_latency_ms,
+        "profiled": not args.no_profile,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    path = os.path.join(out, "results.json")
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "scenarios": results}, f, indent=2)
+    print(f"results and profiles in {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,70 @@
+import os
 import sqlite3
 import json
+import orjson
 from datetime import datetime
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
-DB = "accounts.db"
+DB = os.getenv("ACCOUNTS_DB", "accounts.db")
+_initialized = None  # the DB path whose tables were created
 
 
-with sqlite3.connect(DB) as conn:
-    cursor = conn.cursor()
-    cursor.execute('CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)')
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            datetime DATETIME,
-            type TEXT,
-            message TEXT
-        )
-    ''')
-    cursor.execute('CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)')
-    conn.commit()
-
-def write_account(name, account_dict):
-    json_data = json.dumps(account_dict)
+def init_db():
+    global _initialized
     with sqlite3.connect(DB) as conn:
         cursor = conn.cursor()
+        cursor.execute('CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)')
+        # transactions and portfolio history are kept apart from the account header as orjson blobs,
+        # rows written before these columns existed hold everything as json in account
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(accounts)')}
+        for column in ("transactions", "time_series"):
+            if column not in columns:
+                cursor.execute(f'ALTER TABLE accounts ADD COLUMN {column} BLOB')
         cursor.execute('''
-            INSERT INTO accounts (name, account)
-            VALUES (?, ?)
-            ON CONFLICT(name) DO UPDATE SET account=excluded.account
-        ''', (name.lower(), json_data))
+            CREATE TABLE IF NOT EXISTS logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT,
+                datetime DATETIME,
+                type TEXT,
+                message TEXT
+            )
+        ''')
+        cursor.execute('CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)')
+        conn.commit()
+    _initialized = DB
+
+def connect():
+    """
+    Connection to DB. The tables are created on first use rather than at import,
+    so importing this module never touches a database file.
+    """
+    if _initialized != DB:
+        init_db()
+    return sqlite3.connect(DB)
+
+def write_account(name, account_dict, transactions: bytes, time_series: bytes):
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO accounts (name, account, transactions, time_series)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET account=excluded.account,
+                transactions=excluded.transactions, time_series=excluded.time_series
+        ''', (name.lower(), orjson.dumps(account_dict).decode(), transactions, time_series))
         conn.commit()
 
 def read_account(name):
-    with sqlite3.connect(DB) as conn:
+    """
+    Returns (account fields, transactions blob, time series blob), or None for an unknown account.
+    Both blobs are None for a row in the old format, where the fields hold the whole account.
+    """
+    with connect() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT account FROM accounts WHERE name = ?', (name.lower(),))
+        cursor.execute('SELECT account, transactions, time_series FROM accounts WHERE name = ?', (name.lower(),))
         row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
+        return (orjson.loads(row[0]), row[1], row[2]) if row else None
     
 def write_log(name: str, type: str, message: str):
     """
@@ -52,7 +77,7 @@ def write_log(name: str, type: str, message: str):
     """
     now = datetime.now().isoformat()
     
-    with sqlite3.connect(DB) as conn:
+    with connect() as conn:
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO logs (name, datetime, type, message)
@@ -71,7 +96,7 @@ def read_log(name: str, last_n=10):
     Returns:
         list: A list of tuples containing (datetime, type, message)
     """
-    with sqlite3.connect(DB) as conn:
+    with connect() as conn:
         cursor = conn.cursor()
         cursor.execute('''
             SELECT datetime, type, message FROM logs 
@@ -84,7 +109,7 @@ def read_log(name: str, last_n=10):
 
 def write_market(date: str, data: dict) -> None:
     data_json = json.dumps(data)
-    with sqlite3.connect(DB) as conn:
+    with connect() as conn:
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO market (date, data)
@@ -94,7 +119,7 @@ def write_market(date: str, data: dict) -> None:
         conn.commit()
 
 def read_market(date: str) -> dict | None:
-    with sqlite3.connect(DB) as conn:
+    with connect() as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT data FROM market WHERE date = ?', (date,))
         row = cursor.fetchone()
@@ -1,34 +1,37 @@
 import gradio as gr
-from sidekick import Sidekick
+from session_manager import SessionManager
+
+# sidekicks live in the manager, the gradio state only holds the sidekick id
+manager = SessionManager()
 
 async def setup():
-    sidekick = Sidekick()
-    await sidekick.setup()
-    return sidekick
+    return await manager.open()
 
-def free_resources(sidekick):
+def free_resources(sidekick_id):
     """Used by gr.State.delete_callback, synchronous"""
     print ("cleaning up...")
     try:
-        if sidekick:
-            sidekick.cleanup()
+        manager.close_soon(sidekick_id)
     except Exception as e:
         print (f"Exception during clean up: {e}")
 
-async def process_message(sidekick, message, success_criteria, history):
-    results = await sidekick.run_superstep(message, success_criteria, history)
-    return results
-    # NOte: no longer reutnr results,sidekick as sidekick is the same and it will overwrite
+async def process_message(sidekick_id, message, success_criteria, history):
+    sidekick = manager.get(sidekick_id)
+    if sidekick is None:
+        # evicted after being idle for too long: resume the same conversation from its checkpoints,
+        # the chatbot still shows it. gr.State lives in server memory, a restarted app starts a new one
+        sidekick_id = await manager.open(sidekick_id)
+        sidekick = manager.get(sidekick_id)
+    async for results in sidekick.stream_superstep(message, success_criteria, history):
+        yield results, sidekick_id
 
-async def reset(sidekick: Sidekick):
-    # perform free_resource because we hold heavy objects, it is better to clean up right at the reset moment
-    if sidekick:
-        free_resources(sidekick)
+async def reset(sidekick_id):
+    # close right at the reset moment because we hold heavy objects (browser context)
+    new_sidekick_id = await manager.reset(sidekick_id)
+    return "", "", [], new_sidekick_id
 
-    new_sidekick = Sidekick()
-    await new_sidekick.setup()
-    return "", "", [], new_sidekick
-    #what happen to the previous sidekick?
+def show_metrics():
+    return manager.metrics_text()
 
 with gr.Blocks() as ui:
     gr.Markdown("## Sidekick Personal Co-worker")
@@ -45,15 +48,20 @@ with gr.Blocks() as ui:
     with gr.Row():
         reset_button = gr.Button("Reset", variant="stop")
         go_button = gr.Button("Go!", variant="primary")
+    with gr.Accordion("Metrics", open=False):
+        metrics_textbox = gr.Textbox(show_label=False, lines=12)
+        metrics_button = gr.Button("Refresh")
 
-    ui.load(setup, [], [sidekick_holder]) #sidekick_holder.value should hold sidekick object: setup(**[]) -> sidekick_holder.value
+    ui.load(setup, [], [sidekick_holder]) #sidekick_holder.value holds the sidekick id: setup(**[]) -> sidekick_holder.value
 
     for trigger in (message_textbox.submit,  success_criteria_textbox.submit, go_button.click):
         trigger(
-            process_message, [sidekick_holder, message_textbox, success_criteria_textbox, chatbot_textbox], [chatbot_textbox]
+            process_message, [sidekick_holder, message_textbox, success_criteria_textbox, chatbot_textbox], [chatbot_textbox, sidekick_holder]
         )
 
     reset_button.click(reset, [sidekick_holder], [message_textbox, success_criteria_textbox, chatbot_textbox, sidekick_holder])
+    # also served as a plain-text API endpoint named "metrics"
+    metrics_button.click(show_metrics, [], [metrics_textbox], api_name="metrics")
     
     
 ui.launch(theme="soft")
\ No newline at end of file
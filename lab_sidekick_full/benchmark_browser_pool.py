@@ -0,0 +1,77 @@
+"""Session-start latency and memory per concurrent user: one browser per session vs the shared BrowserPool.
+
+usage: python benchmark_browser_pool.py --users 1 4 16
+"""
+import time
+import asyncio
+import argparse
+import statistics
+
+import psutil
+from playwright.async_api import async_playwright
+
+from sidekick_tools import BrowserPool
+
+
+def tree_rss_mb():
+    """RSS of this process plus its children (the chromium processes)"""
+    me = psutil.Process()
+    total = me.memory_info().rss
+    for child in me.children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return total / 1024 / 1024
+
+
+async def one_browser_per_session(users):
+    playwright = await async_playwright().start()
+
+    async def start_session():
+        start = time.perf_counter()
+        browser = await playwright.chromium.launch(headless=True)
+        page = await browser.new_page()
+        return time.perf_counter() - start, browser, page
+
+    results = await asyncio.gather(*(start_session() for _ in range(users)))
+    rss = tree_rss_mb()
+    for _, browser, _ in results:
+        await browser.close()
+    await playwright.stop()
+    return [r[0] for r in results], rss
+
+
+async def shared_pool(users):
+    pool = BrowserPool()
+    await pool.start()  # warm browsers are started once per process, not per session
+
+    async def start_session():
+        start = time.perf_counter()
+        context = await pool.acquire()
+        page = await context.new_page()
+        return time.perf_counter() - start, context, page
+
+    results = await asyncio.gather(*(start_session() for _ in range(users)))
+    rss = tree_rss_mb()
+    for _, context, _ in results:
+        await pool.release(context)
+    await pool.close()
+    return [r[0] for r in results], rss
+
+
+async def main(user_counts):
+    baseline_rss = tree_rss_mb()
+    print(f"{'mode':<12}{'users':>6}{'p50 start s':>13}{'max start s':>13}{'MB/user':>10}")
+    for users in user_counts:
+        for name, scenario in (("per-session", one_browser_per_session), ("pool", shared_pool)):
+            latencies, rss = await scenario(users)
+            print(f"{name:<12}{users:>6}{statistics.median(latencies):>13.3f}{max(latencies):>13.3f}"
+                  f"{(rss - baseline_rss) / users:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+    asyncio.run(main(args.users))
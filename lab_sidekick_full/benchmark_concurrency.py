@@ -0,0 +1,72 @@
+"""Many Sidekick sessions in one process, with LLM calls replaced by fixed-latency fakes.
+
+With async nodes the sessions overlap, so the wall time stays close to one session's time.
+--blocking makes the fake LLM block the event loop (like the old .invoke() nodes) for comparison.
+Fails unless the sessions overlap at least half as much as they would if fully concurrent.
+
+usage: python benchmark_concurrency.py --sessions 20 --latency 0.5 [--blocking]
+"""
+import time
+import asyncio
+import argparse
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import MemorySaver
+
+from sidekick import Sidekick, EvaluatorOutput
+
+
+class FakeLLM:
+    def __init__(self, output, latency, blocking):
+        self.output = output
+        self.latency = latency
+        self.blocking = blocking
+
+    async def ainvoke(self, messages):
+        if self.blocking:
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+        return self.output
+
+
+@tool
+def noop(text: str) -> str:
+    """does nothing"""
+    return text
+
+
+async def make_sidekick(latency, blocking):
+    sidekick = Sidekick()
+    sidekick.tools = [noop]
+    sidekick.memory = MemorySaver()
+    sidekick.llm_with_worker_tools = FakeLLM(AIMessage(content="done"), latency, blocking)
+    sidekick.llm_with_evaluator_output = FakeLLM(
+        EvaluatorOutput(feedback="ok", success_criteria_met=True, user_input_needed=False), latency, blocking
+    )
+    await sidekick.build_graph()
+    return sidekick
+
+
+async def main(sessions, latency, blocking):
+    sidekicks = [await make_sidekick(latency, blocking) for _ in range(sessions)]
+    start = time.perf_counter()
+    await asyncio.gather(*(s.run_superstep("hello", "", []) for s in sidekicks))
+    elapsed = time.perf_counter() - start
+    serial = sessions * 2 * latency  # worker + evaluator call per session
+    overlap = serial / elapsed
+    print(f"sessions={sessions} blocking={blocking} wall={elapsed:.2f}s serial={serial:.2f}s "
+          f"overlap={overlap:.1f}x")
+    # the blocking run is the baseline and is expected to stay near 1x
+    if not blocking and sessions > 1 and overlap < sessions / 2:
+        raise SystemExit(f"sessions ran (almost) one at a time: overlap {overlap:.1f}x, expected >= {sessions / 2:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--blocking", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.latency, args.blocking))
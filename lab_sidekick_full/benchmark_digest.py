@@ -0,0 +1,52 @@
+"""Evaluator input size over a long worker/evaluator loop: full transcript vs incremental digest.
+
+usage: python benchmark_digest.py --iterations 50
+"""
+import asyncio
+import argparse
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from sidekick_digest import (update_digest, render_digest, count_tokens, truncate_tokens,
+                             DIGEST_TOKEN_BUDGET, SUMMARY_TOKEN_BUDGET)
+
+
+def full_transcript(messages):
+    conversation = "Conversation history: \n\n"
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            conversation += f"User: {message.content}\n"
+        elif isinstance(message, AIMessage):
+            conversation += f"Assistant: {message.content or '[Tools use]'}\n"
+    return conversation
+
+
+async def fake_summarize(summary, turns):
+    # stands in for the summarizer LLM: output is capped the same way
+    return truncate_tokens(summary + " " + " ".join(turns), SUMMARY_TOKEN_BUDGET)
+
+
+async def main(iterations):
+    messages = [HumanMessage(content="find buffet restaurants in nova and save them to a csv " * 5)]
+    digest = None
+    bound = DIGEST_TOKEN_BUDGET + SUMMARY_TOKEN_BUDGET + 50
+    largest = 0
+    print(f"{'iteration':>10}{'full tokens':>14}{'digest tokens':>16}")
+    for i in range(1, iterations + 1):
+        messages.append(AIMessage(content=f"attempt {i}: " + "found some restaurants and wrote rows. " * 30))
+        messages.append(AIMessage(content=f"Evaluator's feedback on this answer: missing zipcodes, try again {i}"))
+        digest = await update_digest(digest, messages, fake_summarize)
+        full, compact = count_tokens(full_transcript(messages)), count_tokens(render_digest(digest))
+        largest = max(largest, compact)
+        if i % 5 == 0:
+            print(f"{i:>10}{full:>14}{compact:>16}")
+    print(f"largest digest: {largest} tokens (bound {bound})")
+    if largest > bound:
+        raise SystemExit("digest grew past its token budget")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
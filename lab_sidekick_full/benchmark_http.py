@@ -0,0 +1,163 @@
+"""Search and push tools against a local stand-in for serper and pushover, no network or api keys needed.
+Checks retries on 429/5xx, timeouts, keep-alive reuse of the pooled client and push-queue delivery,
+and fails on the first check that does not hold.
+
+usage: python benchmark_http.py --requests 50
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import threading
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+
+class StandIn:
+    """what the stand-in server saw, and the statuses it answers /search with next"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = {}
+        self.search_statuses = []
+        self.pushed = []
+
+    def count(self, path):
+        with self.lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+
+def make_handler(state, slow_seconds):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        # headers and body in one write, else delayed acks add ~40ms to every keep-alive request
+        wbufsize = 64 * 1024
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def reply(self, status, body=b"{}"):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+                self.wfile.flush()
+            except BrokenPipeError:
+                pass  # the client gave up on /slow
+
+        def do_GET(self):
+            state.count(self.path)
+            if self.path == "/slow":
+                time.sleep(slow_seconds)
+            self.reply(200)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            state.count(self.path)
+            if self.path == "/search":
+                with state.lock:
+                    status = state.search_statuses.pop(0) if state.search_statuses else 200
+                results = {"organic": [{"snippet": f"result for {json.loads(body)['q']}"}]}
+                self.reply(status, json.dumps(results).encode() if status == 200 else b"{}")
+            elif self.path == "/push":
+                with state.lock:
+                    state.pushed.append(parse_qs(body.decode())["message"][0])
+                self.reply(200, b'{"status": 1}')
+            else:
+                self.reply(404)
+
+    return Handler
+
+
+def check(condition, message):
+    print(("ok    " if condition else "FAIL  ") + message)
+    if not condition:
+        raise SystemExit(message)
+
+
+async def main(requests, timeout):
+    state = StandIn()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state, slow_seconds=timeout * 3))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # sidekick_http reads the urls at import, and builds the client from these settings on first use
+    os.environ["SERPER_URL"] = base + "/search"
+    os.environ["PUSHOVER_URL"] = base + "/push"
+    import sidekick_http
+    sidekick_http.HTTP_TIMEOUT = httpx.Timeout(timeout)
+    sidekick_http.HTTP_RETRY_BACKOFF = 0.01
+
+    state.search_statuses = [429, 503]
+    result = await sidekick_http.serper_search("buffet restaurants")
+    check(result == "result for buffet restaurants" and state.requests["/search"] == 3,
+          f"search retried after 429 and 503 ({state.requests['/search']} requests)")
+
+    state.search_statuses = [500] * sidekick_http.HTTP_RETRIES
+    try:
+        await sidekick_http.serper_search("always failing")
+        failed = None
+    except httpx.HTTPStatusError as e:
+        failed = e.response.status_code
+    check(failed == 500, f"search gave up after {sidekick_http.HTTP_RETRIES} attempts of 500")
+
+    start = time.perf_counter()
+    try:
+        await sidekick_http.request("GET", base + "/slow")
+        timed_out = False
+    except httpx.TimeoutException:
+        timed_out = True
+    elapsed = time.perf_counter() - start
+    check(timed_out and state.requests["/slow"] == sidekick_http.HTTP_RETRIES,
+          f"timeout raised after {state.requests['/slow']} attempts in {elapsed:.2f}s")
+
+    # keep-alive: a warm pooled client makes no new connections, a client per call makes one each
+    await sidekick_http.request("GET", base + "/ok")
+    before = state.connections
+    start = time.perf_counter()
+    for _ in range(requests):
+        await sidekick_http.request("GET", base + "/ok")
+    pooled = time.perf_counter() - start
+    pooled_connections = state.connections - before
+    before = state.connections
+    start = time.perf_counter()
+    for _ in range(requests):
+        async with httpx.AsyncClient() as client:
+            (await client.get(base + "/ok")).raise_for_status()
+    fresh = time.perf_counter() - start
+    fresh_connections = state.connections - before
+    print(f"{requests} requests: pooled {pooled * 1000:.0f}ms on {pooled_connections} new connections, "
+          f"client per call {fresh * 1000:.0f}ms on {fresh_connections}")
+    check(pooled_connections == 0, "pooled client reused its keep-alive connection")
+
+    messages = [f"message {i}" for i in range(5)]
+    start = time.perf_counter()
+    accepted = all(sidekick_http.push_queue.submit(m) for m in messages)
+    submitted = time.perf_counter() - start
+    await asyncio.wait_for(sidekick_http.push_queue.drain(), timeout=10)
+    check(accepted and sorted(state.pushed) == messages,
+          f"push queue delivered {len(state.pushed)}/{len(messages)} messages, submit took {submitted * 1000:.2f}ms")
+
+    await sidekick_http.get_http_client().aclose()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50, help="sequential requests for the keep-alive check")
+    parser.add_argument("--timeout", type=float, default=0.3, help="client timeout used for the timeout check")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.timeout))
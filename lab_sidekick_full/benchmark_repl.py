@@ -0,0 +1,64 @@
+"""Throughput of many concurrent code-executing sessions: in-process exec (like PythonREPLTool) vs ReplPool.
+Also reports the worst event-loop stall, which is what every other Gradio session feels.
+
+usage: python benchmark_repl.py --sessions 16 --calls 4
+"""
+import time
+import asyncio
+import argparse
+
+from sidekick_repl import ReplPool
+
+CODE = "total = sum(i * i for i in range(2_000_000))\nprint(total)"
+
+
+def exec_in_process(code):
+    # print is swallowed instead of redirecting sys.stdout, which is process-wide and races between threads
+    exec(code, {"print": lambda *args, **kwargs: None})
+
+
+async def loop_lag(stop):
+    """largest delay seen by a 10ms ticker"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, time.perf_counter() - start - 0.01)
+    return worst
+
+
+async def measure(run, sessions, calls):
+    stop = asyncio.Event()
+    lag = asyncio.create_task(loop_lag(stop))
+
+    async def session(i):
+        for _ in range(calls):
+            await run(str(i), CODE)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return sessions * calls / elapsed, await lag
+
+
+async def main(sessions, calls, workers):
+    async def in_process(session_id, code):
+        return await asyncio.to_thread(exec_in_process, code)
+
+    pool = ReplPool(size=workers)
+    await pool.start()
+    print(f"{'mode':<12}{'calls/s':>10}{'worst loop stall s':>20}")
+    for name, run in (("in-process", in_process), ("pool", pool.run)):
+        throughput, lag = await measure(run, sessions, calls)
+        print(f"{name:<12}{throughput:>10.2f}{lag:>20.3f}")
+    await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--calls", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.calls, args.workers))
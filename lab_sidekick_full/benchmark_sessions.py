@@ -0,0 +1,51 @@
+"""Soak test for the session lifecycle: open and reset hundreds of sessions and watch for leaks.
+Fails if browser contexts outlive their sessions or memory keeps growing after warm-up.
+
+usage: python benchmark_sessions.py --sessions 300 --concurrency 10
+"""
+import asyncio
+import argparse
+
+from session_manager import SessionManager
+
+
+async def open_browser(manager, sidekick_id):
+    # browser tools are lazy, fetching one leases a browser context for the session
+    await manager.get(sidekick_id).browser_session.get_tool("current_webpage")
+
+
+async def main(sessions, concurrency, max_sessions, growth_mb, browse):
+    manager = SessionManager(max_sessions=max_sessions)
+    ids = [await manager.open() for _ in range(concurrency)]
+    warm = None
+    for i in range(1, sessions + 1):
+        # reset every live session concurrently, like users pressing the reset button
+        ids = await asyncio.gather(*(manager.reset(sid) for sid in ids))
+        if browse:
+            await asyncio.gather(*(open_browser(manager, sid) for sid in ids))
+        if i % 25 == 0:
+            metrics = manager.metrics()
+            print(" ".join(f"{k}={v}" for k, v in metrics.items()))
+            if metrics["browser_contexts"] > len(manager.sessions):
+                raise SystemExit("browser contexts leaked")
+            if warm is None:
+                warm = metrics["memory_rss_mb"]
+    await manager.shutdown()
+    await asyncio.sleep(0.5)
+    metrics = manager.metrics()
+    print(" ".join(f"{k}={v}" for k, v in metrics.items()))
+    if metrics["browser_contexts"] or metrics["sessions_live"]:
+        raise SystemExit("resources still held after closing every session")
+    if warm is not None and metrics["memory_rss_mb"] - warm > growth_mb:
+        raise SystemExit(f"memory grew {metrics['memory_rss_mb'] - warm:.0f}MB after warm-up")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=300, help="reset rounds")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--max-sessions", type=int, default=20)
+    parser.add_argument("--growth-mb", type=float, default=200)
+    parser.add_argument("--no-browse", dest="browse", action="store_false", help="do not start browser contexts")
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.concurrency, args.max_sessions, args.growth_mb, args.browse))
@@ -0,0 +1,54 @@
+"""Import time of the sidekick modules and Sidekick.setup() time, each in a fresh interpreter.
+Track it to keep startup (and first response for users who never browse) fast.
+
+usage: python benchmark_startup.py --runs 5
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+PROBE = """
+import time, json, asyncio
+start = time.perf_counter()
+import sidekick
+imported = time.perf_counter()
+import sidekick_memory
+
+async def setup():
+    s = sidekick.Sidekick()
+    t = time.perf_counter()
+    await s.setup()
+    done = time.perf_counter() - t
+    import sidekick_tools
+    browser_started = sidekick_tools._browser_pool is not None
+    modules = __import__("sys").modules
+    heavy = [m for m in ("playwright.async_api", "wikipedia", "langchain_experimental") if m in modules]
+    # langchain_openai imports tiktoken itself, the cost is loading an encoding file
+    if "tiktoken.registry" in modules and modules["tiktoken.registry"].ENCODINGS:
+        heavy.append("tiktoken encodings")
+    await s.aclose()
+    await sidekick_memory.close_checkpointer()
+    return done, browser_started, heavy
+
+setup_time, browser_started, heavy = asyncio.run(setup())
+print(json.dumps({"import_s": imported - start, "setup_s": setup_time,
+                  "browser_started": browser_started, "heavy_modules_loaded": heavy}))
+"""
+
+
+def run_once():
+    output = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    results = [run_once() for _ in range(args.runs)]
+    print(f"import  median {statistics.median(r['import_s'] for r in results):.3f}s")
+    print(f"setup   median {statistics.median(r['setup_s'] for r in results):.3f}s")
+    print(f"browser started during setup: {results[-1]['browser_started']}")
+    print(f"heavy modules loaded after setup: {results[-1]['heavy_modules_loaded']}")
@@ -0,0 +1,179 @@
+import time
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional
+
+import psutil
+
+from sidekick import Sidekick
+import sidekick_tools
+import sidekick_repl
+import sidekick_memory
+
+MAX_SESSIONS = 20
+IDLE_TIMEOUT_SECONDS = 15 * 60
+REAP_INTERVAL_SECONDS = 30
+
+
+async def create_sidekick(sidekick_id: Optional[str] = None) -> Sidekick:
+    # an existing id resumes that conversation from the checkpointer
+    sidekick = Sidekick(sidekick_id=sidekick_id)
+    await sidekick.setup()
+    return sidekick
+
+
+class Session:
+    def __init__(self, sidekick: Sidekick):
+        self.sidekick = sidekick
+        self.created = time.time()
+        self.last_used = self.created
+
+
+class SessionManager:
+    """Owns every Sidekick of the app: caps how many are alive, queues new ones at capacity,
+    evicts idle ones and always releases their resources"""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, idle_timeout: float = IDLE_TIMEOUT_SECONDS,
+                 factory: Callable[[Optional[str]], Awaitable[Sidekick]] = create_sidekick):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.factory = factory
+        self.sessions: Dict[str, Session] = {}
+        self.starting = 0   # slots reserved by open() calls still running setup
+        self.waiting = 0
+        self.opened = 0
+        self.closed = 0
+        self.evicted = 0
+        self.condition = asyncio.Condition()
+        self.loop = None
+        self.reaper = None
+
+    async def open(self, sidekick_id: Optional[str] = None) -> str:
+        """create a sidekick and return its id, waits while the app is at max_sessions.
+        Passing the id of an evicted or pre-restart sidekick resumes its conversation."""
+        self.loop = asyncio.get_running_loop()
+        if self.reaper is None or self.reaper.done():
+            self.reaper = asyncio.create_task(self._reap())
+        async with self.condition:
+            if sidekick_id in self.sessions:
+                return sidekick_id
+            if len(self.sessions) + self.starting >= self.max_sessions:
+                self.waiting += 1
+                try:
+                    await self.condition.wait_for(lambda: len(self.sessions) + self.starting < self.max_sessions)
+                finally:
+                    self.waiting -= 1
+            self.starting += 1
+        try:
+            sidekick = await self.factory(sidekick_id)
+        except BaseException:
+            async with self.condition:
+                self.starting -= 1
+                self.condition.notify()
+            raise
+        async with self.condition:
+            self.starting -= 1
+            duplicate = sidekick.sidekick_id in self.sessions  # resumed concurrently by another message
+            if not duplicate:
+                self.sessions[sidekick.sidekick_id] = Session(sidekick)
+                self.opened += 1
+            self.condition.notify()
+        if duplicate:
+            await sidekick.aclose()
+        return sidekick.sidekick_id
+
+    def get(self, sidekick_id: Optional[str]) -> Optional[Sidekick]:
+        session = self.sessions.get(sidekick_id)
+        if session is None:
+            return None
+        session.last_used = time.time()
+        return session.sidekick
+
+    async def close(self, sidekick_id: Optional[str]) -> None:
+        async with self.condition:
+            session = self.sessions.pop(sidekick_id, None)
+        if session is None:
+            return
+        try:
+            await session.sidekick.aclose()
+        except Exception as e:
+            print(f"Exception during clean up of {sidekick_id}: {e}")
+        async with self.condition:
+            self.closed += 1
+            self.condition.notify()
+
+    def close_soon(self, sidekick_id: Optional[str]) -> None:
+        """for gr.State delete callbacks, which are synchronous and may run on another thread"""
+        if self.loop is None or sidekick_id not in self.sessions:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            running.create_task(self.close(sidekick_id))
+        else:
+            asyncio.run_coroutine_threadsafe(self.close(sidekick_id), self.loop)
+
+    async def reset(self, sidekick_id: Optional[str]) -> str:
+        await self.close(sidekick_id)
+        if sidekick_id is not None:
+            # a reset conversation is never resumed, drop its checkpoints instead of waiting for the ttl
+            checkpointer = await sidekick_memory.get_checkpointer()
+            await checkpointer.adelete_thread(sidekick_id)
+        return await self.open()
+
+    async def shutdown(self) -> None:
+        """close every sidekick and the shared checkpointer, before the event loop ends"""
+        if self.reaper is not None:
+            self.reaper.cancel()
+        for sid in list(self.sessions):
+            await self.close(sid)
+        await sidekick_memory.close_checkpointer()
+
+    async def evict_idle(self) -> int:
+        cutoff = time.time() - self.idle_timeout
+        idle = [sid for sid, session in self.sessions.items() if session.last_used < cutoff]
+        for sid in idle:
+            await self.close(sid)
+        self.evicted += len(idle)
+        return len(idle)
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(REAP_INTERVAL_SECONDS)
+            try:
+                evicted = await self.evict_idle()
+                if evicted:
+                    print(f"Evicted {evicted} idle sidekick(s)")
+            except Exception as e:
+                print(f"Exception while evicting idle sessions: {e}")
+
+    def metrics(self) -> Dict[str, float]:
+        process = psutil.Process()
+        rss = process.memory_info().rss
+        children = process.children(recursive=True)
+        for child in children:
+            try:
+                rss += child.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        browser_pool = sidekick_tools._browser_pool
+        repl_pool = sidekick_repl._repl_pool
+        return {
+            "sessions_live": len(self.sessions),
+            "sessions_starting": self.starting,
+            "sessions_waiting": self.waiting,
+            "sessions_max": self.max_sessions,
+            "sessions_opened_total": self.opened,
+            "sessions_closed_total": self.closed,
+            "sessions_evicted_total": self.evicted,
+            "browsers": len(browser_pool.browsers) if browser_pool else 0,
+            "browser_contexts": len(browser_pool.leases) if browser_pool else 0,
+            "repl_workers_idle": len(repl_pool.idle) if repl_pool else 0,
+            "child_processes": len(children),
+            "memory_rss_mb": round(rss / 1024 / 1024, 1),
+        }
+
+    def metrics_text(self) -> str:
+        """prometheus text format"""
+        return "".join(f"sidekick_{name} {value}\n" for name, value in self.metrics().items())
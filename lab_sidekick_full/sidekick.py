@@ -4,16 +4,18 @@ from typing_extensions import TypedDict
 
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
 
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from langchain_core.callbacks import get_usage_metadata_callback
 
 from pydantic import BaseModel, Field
 
-from sidekick_tools import playwright_tools, other_tools
+from sidekick_tools import playwright_tools, other_tools, ToolExecutor
+from sidekick_memory import get_checkpointer
+from sidekick_digest import update_digest, render_digest, truncate_tokens, DIGEST_TOKEN_BUDGET
 
+import time
 import uuid
 import asyncio
 from datetime import datetime
@@ -28,6 +30,8 @@ class State(TypedDict):
     feedback_on_work: Optional[str]
     success_criteria_met: bool
     user_input_needed: bool
+    conversation_digest: Optional[Dict[str, Any]]
+    usage: Dict[str, Any]
 
 
 class EvaluatorOutput(BaseModel):
@@ -37,26 +41,64 @@ class EvaluatorOutput(BaseModel):
         description="True if more input is needed from the user, or clarifications, or the assistant is stuck"
     )
 
+class Budget(BaseModel):
+    """limits for one run_superstep, the loop stops early and hands back to the user when one is hit"""
+    max_llm_calls: int = 25
+    max_tool_calls: int = 40
+    max_tokens: int = 200_000
+    max_seconds: float = 300
+
+    def exceeded(self, usage: Dict[str, Any]) -> Optional[str]:
+        if usage["llm_calls"] >= self.max_llm_calls:
+            return f"{usage['llm_calls']} LLM calls (limit {self.max_llm_calls})"
+        if usage["tool_calls"] >= self.max_tool_calls:
+            return f"{usage['tool_calls']} tool calls (limit {self.max_tool_calls})"
+        if usage["tokens"] >= self.max_tokens:
+            return f"{usage['tokens']} tokens (limit {self.max_tokens})"
+        elapsed = time.time() - usage["started_at"]
+        if elapsed >= self.max_seconds:
+            return f"{elapsed:.0f}s (limit {self.max_seconds:.0f}s)"
+        return None
+
+
+def new_usage() -> Dict[str, Any]:
+    return {"llm_calls": 0, "tool_calls": 0, "tokens": 0, "started_at": time.time()}
+
+
+def format_usage(usage: Dict[str, Any]) -> str:
+    return (f"{usage['llm_calls']} LLM calls, {usage['tool_calls']} tool calls, "
+            f"{usage['tokens']} tokens, {time.time() - usage['started_at']:.1f}s")
+
+
+def total_tokens(callback) -> int:
+    return sum(u.get("total_tokens", 0) for u in callback.usage_metadata.values())
+
+
 class Sidekick:
-    def __init__(self):
+    def __init__(self, sidekick_id: Optional[str] = None, budget: Optional[Budget] = None):
         self.worker_llm_with_tools = None    #node
         self.evaluator_llm_with_tools = None
         self.worker_tools = None
         self.llm_with_worker_tools = None
         self.evaluator_tools = None
         self.graph = None
-        self.sidekick_id = str(uuid.uuid4())
-        self.memory = MemorySaver()
-        self.browser = None
-        self.playwright = None
+        # pass a previous sidekick_id to resume its conversation after a restart
+        self.sidekick_id = sidekick_id or str(uuid.uuid4())
+        self.memory = None
+        self.browser_session = None
+        self.loop = None
+        self.budget = budget or Budget()
+        self.last_usage = None
 
     async def setup(self):
-        # define tools
+        self.loop = asyncio.get_running_loop()
+        # define tools, they are lazy: the browser only starts when a browser tool is first used
         playwright_future = playwright_tools()
-        other_future = other_tools()
-        (self.tools, self.browser, self.playwright), self.other_tools = await asyncio.gather(
+        other_future = other_tools(self.sidekick_id)
+        (self.tools, self.browser_session), self.other_tools, self.memory = await asyncio.gather(
                                                             playwright_future,
                                                             other_future,
+                                                            get_checkpointer(),
                                                             )
         self.tools += self.other_tools
         # defines llm with tool binding
@@ -64,11 +106,12 @@ class Sidekick:
         self.llm_with_worker_tools = llm_worker.bind_tools(self.tools)
         llm_evaluator = ChatOpenAI(model="gpt-4o-mini")
         self.llm_with_evaluator_output = llm_evaluator.with_structured_output(EvaluatorOutput)
+        self.llm_summarizer = ChatOpenAI(model="gpt-4o-mini")
 
         #build graph
         await self.build_graph()
 
-    def worker(self, state: State) -> Dict[str, Any]:
+    async def worker(self, state: State) -> Dict[str, Any]:
         """processing logic of the worker node"""
         system_message = f"""You are a helpful assistant that use tools to complete tasks.
 Keep working on task until you have questions or clarification from users or success criteria are met.
@@ -94,44 +137,65 @@ Use this feedback to continue the assignment, verify if success criteria is met
         if not found_system_message: 
             messages = [SystemMessage(content=system_message)] + messages
         #why processing task receive raw HumanMesage and AIMessage class
-        response = self.llm_with_worker_tools.invoke(messages) # -> No worries, langchain automatically extract {"role": ..., "content": ...} as input to LLM. https://docs.langchain.com/oss/python/langchain/models
+        with get_usage_metadata_callback() as callback:
+            response = await self.llm_with_worker_tools.ainvoke(messages) # -> No worries, langchain automatically extract {"role": ..., "content": ...} as input to LLM. https://docs.langchain.com/oss/python/langchain/models
         #response here should have tool_calls key if they decide to invoke
+        usage = dict(state["usage"])
+        usage["llm_calls"] += 1
+        usage["tool_calls"] += len(getattr(response, "tool_calls", None) or [])
+        usage["tokens"] += total_tokens(callback)
     
-        return {"messages": [response]}
+        return {"messages": [response], "usage": usage}
 
     def worker_router(self, state:State) -> str:
         """custom made tool routing function for conditional edge in langgraph"""
+        if self.budget.exceeded(state["usage"]):
+            return "budget"
         last_message = state["messages"][-1]
         if hasattr(last_message, "tool_calls") and last_message.tool_calls: #note: last_message maybe HumanMessage or AIMessage, not a dict
             return "tools"
         else:
             return "evaluator"
 
-    def format_conversation(self, messages: List[Any]) -> str:
-        conversation = "Conversation history: \n\n"
-        for message in messages:
-            if isinstance(message, HumanMessage):
-                conversation += f"User: {message.content}\n"
-            elif isinstance(message, AIMessage):
-                text = message.content or "[Tools use]"
-                conversation += f"Assistant: {text}\n"
-        return conversation  #but here we only get content
-
-    def evaluator(self, state: State) -> State:
+    async def summarize_turns(self, summary: str, turns: List[str]) -> str:
+        """merge turns that left the evaluator's recent window into the running summary"""
+        new_turns = "\n".join(turns)
+        prompt = f"""Update the running summary of a conversation between a User and an Assistant.
+Keep the user's requests, decisions, facts found and open issues. Be brief.
+Current summary:
+{summary or "(empty)"}
+
+New turns:
+{new_turns}
+"""
+        response = await self.llm_summarizer.ainvoke([HumanMessage(content=prompt)])
+        return response.content
+
+    async def evaluator(self, state: State) -> State:
         last_response = state["messages"][-1].content
+        summaries = 0
+
+        async def summarize(summary, turns):
+            nonlocal summaries
+            summaries += 1
+            return await self.summarize_turns(summary, turns)
+
+        with get_usage_metadata_callback() as digest_callback:
+            # only messages added since the last evaluation are folded in, the input stays bounded on long tasks
+            digest = await update_digest(state.get("conversation_digest"), state["messages"], summarize)
     
         system_message = """You are strict and succint evaluator who determines if a task is completed successfully by an Assistant or not.
 Assess the Assistant's last response, and provide feedback and decision whether the success criteria has been met.
 """
         user_message = f"""You are evaluating a conversation between the User and Assistant.
 Conversation history with assistant, starting with user original request is:
-{self.format_conversation(state["messages"])}
+{render_digest(digest)}
 
 Success criteria for this assignment:
 {state["success_criteria"]}
 
 Final response from the Assistant for evaluation:
-{last_response}
+{truncate_tokens(last_response, DIGEST_TOKEN_BUDGET)}
 
 Now, begin evaluating.
 """
@@ -141,13 +205,19 @@ Now, begin evaluating.
     
         evaluator_message = [SystemMessage(content=system_message), HumanMessage(content=user_message)]
     
-        eval_result = self.llm_with_evaluator_output.invoke(evaluator_message)# unreliable tool calling here, method="json_mode", include_raw=False)
+        with get_usage_metadata_callback() as eval_callback:
+            eval_result = await self.llm_with_evaluator_output.ainvoke(evaluator_message)# unreliable tool calling here, method="json_mode", include_raw=False)
+        usage = dict(state["usage"])
+        usage["llm_calls"] += 1 + summaries
+        usage["tokens"] += total_tokens(digest_callback) + total_tokens(eval_callback)
         new_state = { 
             #message include information that also attached to the state
             "messages": [{"role": "assistant", "content": f"Evaluator's feedback on this answer: {eval_result.feedback}"}],
             "feedback_on_work": eval_result.feedback,
             "success_criteria_met": eval_result.success_criteria_met,
-            "user_input_needed": eval_result.user_input_needed
+            "user_input_needed": eval_result.user_input_needed,
+            "conversation_digest": digest,
+            "usage": usage,
         }
         return new_state
 
@@ -155,48 +225,109 @@ Now, begin evaluating.
         """Evaluator router, used on conditional edge on langgraph, Nope, maybe it as there is no tool call, but may be still condition to worker node"""
         if state['success_criteria_met'] or state['user_input_needed']:
             return "END" # ok criteria, ready to answer, or need to double check
+        elif self.budget.exceeded(state["usage"]):
+            return "budget"
         else:
             return "worker"
 
+    def budget_stop(self, state: State) -> Dict[str, Any]:
+        """ends the loop early and hands back to the user"""
+        reason = self.budget.exceeded(state["usage"])
+        messages = []
+        last_message = state["messages"][-1]
+        # every tool call needs an answer, or the next request to the LLM is rejected
+        for tool_call in getattr(last_message, "tool_calls", None) or []:
+            messages.append(ToolMessage(content="Not run: budget exceeded", tool_call_id=tool_call["id"]))
+        messages.append({"role": "assistant", "content": f"Stopped early, budget exceeded: {reason}. Please refine the request or continue."})
+        return {"messages": messages, "user_input_needed": True}
+
         
     async def build_graph(self):
         graph_builder = StateGraph(State)
 
         graph_builder.add_node("worker", self.worker)
-        graph_builder.add_node("tools", ToolNode(self.tools))
+        graph_builder.add_node("tools", ToolExecutor(self.tools))
         graph_builder.add_node("evaluator", self.evaluator)
+        graph_builder.add_node("budget", self.budget_stop)
 
         graph_builder.add_edge(START, "worker")
-        graph_builder.add_conditional_edges("worker", self.worker_router, {"tools": "tools", "evaluator": "evaluator"})
+        graph_builder.add_conditional_edges("worker", self.worker_router, {"tools": "tools", "evaluator": "evaluator", "budget": "budget"})
         graph_builder.add_edge("tools", "worker")
-        graph_builder.add_conditional_edges("evaluator", self.evaluator_router, {"worker": "worker", "END": END})
+        graph_builder.add_conditional_edges("evaluator", self.evaluator_router, {"worker": "worker", "budget": "budget", "END": END})
+        graph_builder.add_edge("budget", END)
         # no end edge, embeded in conditional edge already
         self.graph = graph_builder.compile(checkpointer=self.memory)
 
+    def initial_state(self, message, success_criteria) -> State:
+        return {"messages": message,
+                "success_criteria": success_criteria or "The answer should be clear and accurate",
+                "feedback_on_work": None,
+                "success_criteria_met": False,
+                "user_input_needed": False,
+                "usage": new_usage(),
+               }
+
+    @staticmethod
+    def last_reply(messages) -> str:
+        """last assistant text of this superstep before the closing message; a budget stop after a tool call
+        leaves tool results and an empty tool-call turn in between"""
+        for message in reversed(messages[:-1]):
+            if message.type == "human":
+                break
+            if message.type == "ai" and message.content:
+                return message.content
+        return "No answer yet."
+
+    def final_history(self, result, history, user):
+        """chat history after a superstep, with the usage of the superstep appended to the feedback"""
+        self.last_usage = result["usage"]
+        usage = format_usage(result["usage"])
+        print(f"Superstep usage for {self.sidekick_id}: {usage}")
+        reply = {"role": "assistant", "content": self.last_reply(result["messages"])}
+        feedback = {"role": "assistant", "content": f"{result['messages'][-1].content}\n\n_Usage: {usage}_"}
+        return history + [user, reply, feedback]
+
     async def run_superstep(self, message, success_criteria, history):
         config = {"configurable": {"thread_id": self.sidekick_id}}
-        state = {"messages": message,
-                 "success_criteria": success_criteria or "The answer should be clear and accurate",
-                 "feedback_on_work": None,
-                 "success_criteria_met": False,
-                 "user_input_needed": False,
-                }
+        state = self.initial_state(message, success_criteria)
         result = await self.graph.ainvoke(state, config=config)
         user = {"role": "user", "content": message} # a user message input to LLM
-        reply = {"role": "assistant", "content": result["messages"][-2].content}
-        feedback = {"role": "assistant", "content": result["messages"][-1].content}
-    
-        return history + [user, reply, feedback]
+        return self.final_history(result, history, user)
+
+    async def stream_superstep(self, message, success_criteria, history):
+        """same as run_superstep, but yields the chat history while the worker's reply is being generated"""
+        config = {"configurable": {"thread_id": self.sidekick_id}}
+        state = self.initial_state(message, success_criteria)
+        user = {"role": "user", "content": message}
+        partial = ""
+        async for event in self.graph.astream_events(state, config=config, version="v2"):
+            if event.get("metadata", {}).get("langgraph_node") != "worker":
+                continue
+            if event["event"] == "on_chat_model_start":
+                partial = ""  # each worker turn (after a tool call or a rejection) starts a new reply
+            elif event["event"] == "on_chat_model_stream":
+                token = event["data"]["chunk"].content
+                if token:
+                    partial += token
+                    yield history + [user, {"role": "assistant", "content": partial}]
+        result = (await self.graph.aget_state(config)).values
+        yield self.final_history(result, history, user)
+
+    async def aclose(self):
+        """hand the browser context (if one was started) back to the shared pool"""
+        if self.browser_session:
+            await self.browser_session.aclose()
 
     def cleanup(self):
-        if self.browser: 
-            try: 
-                loop = asyncio.get_running_loop()
-                loop.create_task(self.browswer.close())
-                if self.playwright:
-                    loop.create_task(self.playwright.stop())
+        """synchronous version of aclose"""
+        if self.browser_session and self.loop:
+            release = self.aclose()
+            try:
+                running = asyncio.get_running_loop()
             except RuntimeError:
-                asyncio.run(self.browswer.close())
-                if self.playwright:
-                    asyncio.run(self.playwright.stop())
-        
\ No newline at end of file
+                running = None
+            if running is self.loop:
+                running.create_task(release)
+            else:
+                # gr.State delete callbacks may run outside the event loop that owns the browser
+                asyncio.run_coroutine_threadsafe(release, self.loop)
@@ -0,0 +1,80 @@
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+DIGEST_RECENT_TURNS = 6
+DIGEST_TOKEN_BUDGET = 1500   # tokens for the verbatim recent turns
+SUMMARY_TOKEN_BUDGET = 400   # tokens for the running summary of older turns
+MAX_TURN_TOKENS = 400        # a single turn is clipped to this
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """loaded on first use, the encoding file may have to be downloaded.
+    None (no tiktoken, or its file cannot be loaded) falls back to ~4 characters per token"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"tiktoken encoding unavailable, estimating tokens from length: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    # page text may contain special-token strings like <|endoftext|>, count them as plain text
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    encoding = _encoding()
+    if encoding is None:
+        return text[: max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens]) + " ..."
+
+
+def format_turn(message: Any) -> Optional[str]:
+    """one line per user/assistant message, tool calls and system messages are skipped"""
+    if isinstance(message, HumanMessage):
+        return truncate_tokens(f"User: {message.content}", MAX_TURN_TOKENS)
+    if isinstance(message, AIMessage):
+        text = message.content or "[Tools use]"
+        return truncate_tokens(f"Assistant: {text}", MAX_TURN_TOKENS)
+    return None
+
+
+def empty_digest() -> Dict[str, Any]:
+    return {"summary": "", "recent": [], "seen": 0}
+
+
+async def update_digest(
+    digest: Optional[Dict[str, Any]],
+    messages: List[Any],
+    summarize: Callable[[str, List[str]], Awaitable[str]],
+) -> Dict[str, Any]:
+    """fold only the messages added since the last update into the digest.
+    Turns that fall out of the recent window are merged into the summary with summarize(summary, turns)."""
+    digest = digest or empty_digest()
+    new_turns = [t for t in (format_turn(m) for m in messages[digest["seen"]:]) if t]
+    recent = digest["recent"] + new_turns
+
+    overflow = []
+    while recent and (len(recent) > DIGEST_RECENT_TURNS or sum(count_tokens(t) for t in recent) > DIGEST_TOKEN_BUDGET):
+        overflow.append(recent.pop(0))
+
+    summary = digest["summary"]
+    if overflow:
+        summary = truncate_tokens(await summarize(summary, overflow), SUMMARY_TOKEN_BUDGET)
+    return {"summary": summary, "recent": recent, "seen": len(messages)}
+
+
+def render_digest(digest: Dict[str, Any]) -> str:
+    parts = ["Conversation history: \n\n"]
+    if digest["summary"]:
+        parts.append(f"Summary of earlier conversation: {digest['summary']}\n")
+    parts.extend(f"{turn}\n" for turn in digest["recent"])
+    return "".join(parts)
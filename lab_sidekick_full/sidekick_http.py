@@ -0,0 +1,138 @@
+import os
+import asyncio
+import contextvars
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+load_dotenv()
+
+pushover_token = os.getenv("PUSHOVER_TOKEN")
+pushover_user = os.getenv("PUSHOVER_USER")
+# the urls can point to a local stand-in server when testing
+pushover_url = os.getenv("PUSHOVER_URL", "https://api.pushover.net/1/messages.json")
+serper_url = os.getenv("SERPER_URL", "https://google.serper.dev/search")
+
+HTTP_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+HTTP_RETRIES = 3
+HTTP_RETRY_BACKOFF = 0.5
+RETRY_STATUS = {429, 500, 502, 503, 504}
+PUSH_QUEUE_SIZE = 100
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """one pooled client per event loop, keeps connections alive between tool calls"""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or loop is not _client_loop:
+        # the connections of a client are bound to the loop that opened them
+        _client_loop = loop
+        _client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            # the pool limits belong to the transport, the client ignores its own when one is given
+            transport=httpx.AsyncHTTPTransport(retries=1, limits=HTTP_LIMITS),  # retries failed connects
+        )
+    return _client
+
+
+async def request(method: str, url: str, **kwargs) -> httpx.Response:
+    """request with retries on timeouts, connection errors, 429 and 5xx, exponential backoff"""
+    client = get_http_client()
+    for attempt in range(HTTP_RETRIES):
+        last = attempt == HTTP_RETRIES - 1
+        try:
+            response = await client.request(method, url, **kwargs)
+        except (httpx.TimeoutException, httpx.TransportError):
+            if last:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUS or last:
+                response.raise_for_status()
+                return response
+        await asyncio.sleep(HTTP_RETRY_BACKOFF * 2 ** attempt)
+
+
+def format_serper_results(results: dict, k: int = 10) -> str:
+    """same shape of text as GoogleSerperAPIWrapper.run"""
+    snippets = []
+    answer_box = results.get("answerBox") or {}
+    for key in ("answer", "snippet"):
+        if answer_box.get(key):
+            return str(answer_box[key]).replace("\n", " ")
+    if answer_box.get("snippetHighlighted"):
+        return str(answer_box["snippetHighlighted"])
+    graph = results.get("knowledgeGraph") or {}
+    if graph:
+        title = graph.get("title", "")
+        if graph.get("type"):
+            snippets.append(f"{title}: {graph['type']}.")
+        if graph.get("description"):
+            snippets.append(graph["description"])
+        for attribute, value in (graph.get("attributes") or {}).items():
+            snippets.append(f"{title} {attribute}: {value}.")
+    for result in (results.get("organic") or [])[:k]:
+        if result.get("snippet"):
+            snippets.append(result["snippet"])
+        for attribute, value in (result.get("attributes") or {}).items():
+            snippets.append(f"{attribute}: {value}.")
+    return " ".join(snippets) if snippets else "No good Google Search Result was found"
+
+
+async def serper_search(query: str) -> str:
+    response = await request(
+        "POST", serper_url,
+        headers={"X-API-KEY": os.getenv("SERPER_API_KEY", ""), "Content-Type": "application/json"},
+        json={"q": query, "gl": "us", "hl": "en", "num": 10},
+    )
+    return format_serper_results(response.json())
+
+
+class PushQueue:
+    """fire-and-forget push notifications, a background task delivers them so the agent never waits"""
+
+    def __init__(self, maxsize: int = PUSH_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.worker: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def submit(self, msg: str) -> bool:
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            # a new event loop (e.g. a second asyncio.run): the worker died with the old one,
+            # messages it had not sent yet move to a queue of the new loop
+            old, self.queue = self.queue, asyncio.Queue(maxsize=self.maxsize)
+            while not old.empty():
+                self.queue.put_nowait(old.get_nowait())
+            self.loop, self.worker = loop, None
+        if self.worker is None or self.worker.done():
+            # empty context: the worker outlives the tool call that started it, so it must not inherit
+            # its tracing or callbacks
+            self.worker = contextvars.Context().run(loop.create_task, self._work())
+        try:
+            self.queue.put_nowait(msg)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _work(self):
+        while True:
+            msg = await self.queue.get()
+            try:
+                await request("POST", pushover_url, data={"token": pushover_token, "user": pushover_user, "message": msg})
+                print (f"Message {msg[:5]} is pushed")
+            except Exception as e:
+                print (f"Push of message {msg[:5]} failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def drain(self):
+        """wait until every queued notification was attempted"""
+        await self.queue.join()
+
+
+push_queue = PushQueue()
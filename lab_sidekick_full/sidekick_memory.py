@@ -0,0 +1,142 @@
+import time
+import zlib
+import asyncio
+from typing import Any, Optional
+
+import aiosqlite
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+CHECKPOINT_DB = "sidekick_checkpoints.db"
+KEEP_LAST_CHECKPOINTS = 5
+THREAD_TTL_SECONDS = 24 * 60 * 60
+EVICT_INTERVAL_SECONDS = 5 * 60
+COMPRESS_MIN_BYTES = 512
+
+
+class CompressedSerializer(SerializerProtocol):
+    """zlib-compress serialized checkpoints, page dumps from playwright compress very well"""
+
+    def __init__(self, serde: Optional[SerializerProtocol] = None, min_bytes: int = COMPRESS_MIN_BYTES):
+        self.serde = serde or JsonPlusSerializer()
+        self.min_bytes = min_bytes
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.serde.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.serde.loads(data)
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) >= self.min_bytes:
+            return f"{type_}+zlib", zlib.compress(data)
+        return type_, data
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith("+zlib"):
+            type_, payload = type_[: -len("+zlib")], zlib.decompress(payload)
+        return self.serde.loads_typed((type_, payload))
+
+
+class CompactingSqliteSaver(AsyncSqliteSaver):
+    """SQLite checkpointer that only keeps the last few checkpoints per thread and evicts idle threads"""
+
+    def __init__(
+        self,
+        conn: aiosqlite.Connection,
+        keep_last: int = KEEP_LAST_CHECKPOINTS,
+        thread_ttl: float = THREAD_TTL_SECONDS,
+        evict_interval: float = EVICT_INTERVAL_SECONDS,
+    ):
+        super().__init__(conn, serde=CompressedSerializer())
+        self.keep_last = keep_last
+        self.thread_ttl = thread_ttl
+        self.evict_interval = evict_interval
+        self.last_evicted = 0.0
+        self.compaction_ready = False
+
+    async def setup(self) -> None:
+        # AsyncSqliteSaver calls setup() before every operation
+        await super().setup()
+        if self.compaction_ready:
+            return
+        async with self.lock:
+            await self.conn.execute("PRAGMA journal_mode=WAL")
+            await self.conn.execute("PRAGMA synchronous=NORMAL")
+            await self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, last_seen REAL)"
+            )
+            await self.conn.commit()
+        self.compaction_ready = True
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        next_config = await super().aput(config, checkpoint, metadata, new_versions)
+        configurable = next_config["configurable"]
+        await self.compact(configurable["thread_id"], configurable.get("checkpoint_ns", ""))
+        if time.time() - self.last_evicted > self.evict_interval:
+            await self.evict_idle()
+        return next_config
+
+    async def compact(self, thread_id: str, checkpoint_ns: str = "") -> None:
+        """drop everything but the newest keep_last checkpoints (and their writes) of a thread"""
+        async with self.lock:
+            await self.conn.execute(
+                "INSERT INTO thread_activity (thread_id, last_seen) VALUES (?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET last_seen=excluded.last_seen",
+                (thread_id, time.time()),
+            )
+            for table in ("writes", "checkpoints"):
+                await self.conn.execute(
+                    f"""DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN (
+                        SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?
+                        ORDER BY checkpoint_id DESC LIMIT ?)""",
+                    (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.keep_last),
+                )
+            await self.conn.commit()
+
+    async def evict_idle(self) -> None:
+        """delete threads that have not been written to for longer than thread_ttl"""
+        self.last_evicted = time.time()
+        cutoff = self.last_evicted - self.thread_ttl
+        async with self.lock:
+            for table in ("writes", "checkpoints"):
+                await self.conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id IN (SELECT thread_id FROM thread_activity WHERE last_seen < ?)",
+                    (cutoff,),
+                )
+            await self.conn.execute("DELETE FROM thread_activity WHERE last_seen < ?", (cutoff,))
+            await self.conn.commit()
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        async with self.lock:
+            for table in ("writes", "checkpoints", "thread_activity"):
+                await self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            await self.conn.commit()
+
+
+_checkpointer: Optional[CompactingSqliteSaver] = None
+_checkpointer_lock = asyncio.Lock()
+
+
+async def get_checkpointer(db: str = CHECKPOINT_DB) -> CompactingSqliteSaver:
+    """one checkpointer (and sqlite connection) shared by every sidekick in the process"""
+    global _checkpointer
+    async with _checkpointer_lock:
+        if _checkpointer is None:
+            conn = await aiosqlite.connect(db)
+            saver = CompactingSqliteSaver(conn)
+            await saver.setup()
+            _checkpointer = saver
+    return _checkpointer
+
+
+async def close_checkpointer() -> None:
+    """close the shared sqlite connection, its thread keeps the process from exiting otherwise"""
+    global _checkpointer
+    async with _checkpointer_lock:
+        saver, _checkpointer = _checkpointer, None
+    if saver is not None:
+        await saver.conn.close()
@@ -0,0 +1,189 @@
+import io
+import os
+import gc
+import sys
+import json
+import asyncio
+import weakref
+import resource
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+
+REPL_WORKERS = 4
+REPL_TIMEOUT_SECONDS = 30
+REPL_CPU_SECONDS = 20
+REPL_MEMORY_MB = 512
+REPL_MAX_OUTPUT_CHARS = 10_000
+REPL_STATE_RESET_NOTE = "Note: interpreter state was reset, variables and imports from earlier calls are gone\n"
+
+
+def worker_main(memory_mb):
+    """child process loop: one JSON request per line on stdin, one JSON reply per line.
+    A process only ever serves one session, so its variables persist between the calls of that session;
+    the pool starts a fresh process before a worker is handed to another session."""
+    # keep private copies of the protocol pipes so user code printing or calling input() cannot corrupt them
+    requests = os.fdopen(os.dup(0), "r")
+    replies = os.fdopen(os.dup(1), "w")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(2, 1)
+
+    # bound before any user code runs, rebinding json.dumps in a session must not break the protocol
+    decode, encode, getrusage, setrlimit = json.loads, json.dumps, resource.getrusage, resource.setrlimit
+    limit = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    namespace = {"__name__": "__main__"}
+    for line in requests:
+        request = decode(line)
+        # RLIMIT_CPU counts the whole process, so the limit is set relative to what was used so far
+        usage = getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime) + 1
+        setrlimit(resource.RLIMIT_CPU, (used + request["cpu_seconds"], used + request["cpu_seconds"] + 1))
+        output = io.StringIO()
+        try:
+            with redirect_stdout(output), redirect_stderr(output):
+                exec(request["code"], namespace)
+        except MemoryError:
+            namespace = {"__name__": "__main__"}
+            gc.collect()
+            output.write(f"MemoryError: exceeded {memory_mb}MB, interpreter state was reset")
+        except BaseException:
+            output.write(traceback.format_exc(limit=5))
+        replies.write(encode({"output": output.getvalue()[-REPL_MAX_OUTPUT_CHARS:]}) + "\n")
+        replies.flush()
+
+
+class ReplWorker:
+    def __init__(self, process):
+        self.process = process
+        self.session_id = None
+
+    @classmethod
+    async def start(cls, memory_mb):
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), str(memory_mb),
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, limit=2**20,
+        )
+        return cls(process)
+
+    async def call(self, session_id, code, cpu_seconds, timeout):
+        self.session_id = session_id
+        request = {"session_id": session_id, "code": code, "cpu_seconds": cpu_seconds}
+        self.process.stdin.write((json.dumps(request) + "\n").encode())
+        await self.process.stdin.drain()
+        line = await asyncio.wait_for(self.process.stdout.readline(), timeout)
+        if not line:
+            raise EOFError("worker exited")
+        return json.loads(line)["output"]
+
+    async def kill(self):
+        if self.process.returncode is None:
+            self.process.kill()
+        await self.process.wait()
+
+
+class ReplPool:
+    """Pre-started interpreter processes executing agent code off the server's event loop and GIL"""
+
+    def __init__(self, size=REPL_WORKERS, timeout=REPL_TIMEOUT_SECONDS, cpu_seconds=REPL_CPU_SECONDS,
+                 memory_mb=REPL_MEMORY_MB):
+        self.size = size
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.idle = []
+        self.replacing = set()
+        # one lock per session while it has calls in flight, so parallel tool calls run in order on its worker
+        self.session_locks = weakref.WeakValueDictionary()
+        self.closed = False
+        self.condition = asyncio.Condition()
+
+    async def start(self):
+        self.idle = list(await asyncio.gather(*(ReplWorker.start(self.memory_mb) for _ in range(self.size))))
+
+    async def _acquire(self, session_id):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.idle)
+            # a worker that last ran this session still has its variables, a fresh one needs no restart,
+            # else the least recently used worker is taken over and its session loses its state
+            for wanted in (session_id, None):
+                for worker in self.idle:
+                    if worker.session_id == wanted:
+                        self.idle.remove(worker)
+                        return worker
+            return self.idle.pop(0)
+
+    async def _release(self, worker):
+        async with self.condition:
+            self.idle.append(worker)
+            self.condition.notify()
+
+    async def _replace(self, worker):
+        await worker.kill()
+        fresh = await ReplWorker.start(self.memory_mb)
+        if self.closed:
+            await fresh.kill()
+        else:
+            await self._release(fresh)
+
+    def _replace_soon(self, worker):
+        """kill a worker that cannot be reused and start another one in the background,
+        so the slot comes back even when the caller was cancelled"""
+        task = asyncio.get_running_loop().create_task(self._replace(worker))
+        self.replacing.add(task)
+        task.add_done_callback(self.replacing.discard)
+
+    async def run(self, session_id, code, expect_state=False):
+        """run code for a session, its calls are serialized on the worker holding its variables.
+        With expect_state (the session ran code before), output starts with a note when they were lost."""
+        lock = self.session_locks.get(session_id)
+        if lock is None:
+            lock = self.session_locks[session_id] = asyncio.Lock()
+        async with lock:
+            return await self._run(session_id, code, expect_state)
+
+    async def _run(self, session_id, code, expect_state):
+        worker = await self._acquire(session_id)
+        note = REPL_STATE_RESET_NOTE if expect_state and worker.session_id != session_id else ""
+        try:
+            if worker.session_id not in (None, session_id):
+                # modules, builtins, cwd and env vars changed by the previous session must not carry over
+                await worker.kill()
+                worker = await ReplWorker.start(self.memory_mb)
+            output = await worker.call(session_id, code, self.cpu_seconds, self.timeout)
+        except (asyncio.TimeoutError, EOFError, BrokenPipeError, ConnectionResetError) as e:
+            # runaway or crashed (cpu limit, segfault): replace the process, the session loses its state
+            self._replace_soon(worker)
+            if isinstance(e, asyncio.TimeoutError):
+                return f"Error: execution took longer than {self.timeout}s, interpreter state was reset"
+            return "Error: the interpreter crashed or hit the CPU limit, interpreter state was reset"
+        except BaseException:
+            # cancelled mid-call: the child may still be running the code and its reply would go to the next caller
+            self._replace_soon(worker)
+            raise
+        await self._release(worker)
+        return note + output
+
+    async def close(self):
+        self.closed = True
+        async with self.condition:
+            workers, self.idle = self.idle, []
+        await asyncio.gather(*(w.kill() for w in workers), *self.replacing, return_exceptions=True)
+
+
+_repl_pool = None
+_repl_pool_lock = asyncio.Lock()
+
+
+async def get_repl_pool():
+    global _repl_pool
+    async with _repl_pool_lock:
+        if _repl_pool is None:
+            pool = ReplPool()
+            await pool.start()
+            _repl_pool = pool
+    return _repl_pool
+
+
+if __name__ == "__main__":
+    worker_main(int(sys.argv[1]))
@@ -1,54 +1,372 @@
-from playwright.async_api import async_playwright
+# playwright, the community toolkits and wikipedia are imported inside the functions that need them,
+# so importing this module and Sidekick.setup() stay fast. Tools are built on their first call.
+from langchain_core.tools import tool, BaseTool, ToolException
+from langchain_core.messages import ToolMessage
 
-from langchain.tools import tool
-from langchain_community.agent_toolkits import PlayWrightBrowserToolkit
-from langchain_community.agent_toolkits import FileManagementToolkit
-from langchain_community.tools.wikipedia.tool import WikipediaQueryRun
-from langchain_community.utilities import GoogleSerperAPIWrapper
-from langchain_community.utilities.wikipedia import WikipediaAPIWrapper
+from sidekick_repl import get_repl_pool
+from sidekick_http import serper_search, push_queue
 
-from langchain_experimental.tools import PythonREPLTool
-
-import os
-import requests
+import json
+import time
+import uuid
+import asyncio
+from functools import lru_cache
+from typing import Awaitable, Callable
+from collections import OrderedDict
 from dotenv import load_dotenv
 load_dotenv()
 
-pushover_token = os.getenv("PUSHOVER_TOKEN")
-pushover_user = os.getenv("PUSHOVER_USER")
-pushover_url = "https://api.pushover.net/1/messages.json"
-serper = GoogleSerperAPIWrapper()
+BROWSER_POOL_SIZE = 2
+MAX_CONTEXTS_PER_BROWSER = 8
+RECYCLE_BROWSER_AFTER = 50
+
+
+class PooledBrowser:
+    def __init__(self, browser):
+        self.browser = browser
+        self.active = 0
+        self.uses = 0
+
+
+class BrowserPool:
+    """A few warm headless browsers shared by all sessions, each session gets its own BrowserContext"""
+
+    def __init__(self, size=BROWSER_POOL_SIZE, max_contexts=MAX_CONTEXTS_PER_BROWSER,
+                 recycle_after=RECYCLE_BROWSER_AFTER, headless=True):
+        self.size = size
+        self.max_contexts = max_contexts
+        self.recycle_after = recycle_after
+        self.headless = headless
+        self.playwright = None
+        self.browsers = []
+        self.leases = {}  # context -> PooledBrowser
+        self.condition = asyncio.Condition()
+
+    async def start(self):
+        from playwright.async_api import async_playwright
+        self.playwright = await async_playwright().start()
+        self.browsers = list(await asyncio.gather(*(self._launch() for _ in range(self.size))))
+
+    async def _launch(self):
+        browser = await self.playwright.chromium.launch(headless=self.headless)
+        return PooledBrowser(browser)
+
+    def _pick(self):
+        # least busy browser that still accepts contexts and is not waiting to be recycled
+        candidates = [b for b in self.browsers if b.active < self.max_contexts and b.uses < self.recycle_after]
+        return min(candidates, key=lambda b: b.active, default=None)
+
+    async def acquire(self):
+        """lease an isolated BrowserContext, waits when every browser is at max_contexts"""
+        async with self.condition:
+            while True:
+                pooled = self._pick()
+                # a retiring browser only drains its last contexts, its replacement launches meanwhile
+                serving = sum(1 for b in self.browsers if b.uses < self.recycle_after)
+                if pooled is None and serving < self.size:
+                    pooled = await self._launch()
+                    self.browsers.append(pooled)
+                if pooled is not None:
+                    break
+                await self.condition.wait()
+            pooled.active += 1
+            pooled.uses += 1
+        try:
+            context = await pooled.browser.new_context()
+        except Exception:
+            async with self.condition:
+                pooled.active -= 1
+                self.condition.notify()
+            raise
+        self.leases[context] = pooled
+        return context
+
+    async def release(self, context):
+        """close the session's context, safe to call more than once"""
+        pooled = self.leases.pop(context, None)
+        if pooled is None:
+            return
+        try:
+            await context.close()
+        except Exception as e:
+            print(f"Exception closing browser context: {e}")
+        async with self.condition:
+            pooled.active -= 1
+            retire = pooled.uses >= self.recycle_after and pooled.active == 0
+            if retire:
+                self.browsers.remove(pooled)
+            self.condition.notify_all()
+        if retire:
+            # replaced lazily by the next acquire()
+            await pooled.browser.close()
+
+    async def close(self):
+        for context in list(self.leases):
+            await self.release(context)
+        for pooled in self.browsers:
+            await pooled.browser.close()
+        self.browsers = []
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+
+_browser_pool = None
+_browser_pool_lock = asyncio.Lock()
+
+
+async def get_browser_pool():
+    global _browser_pool
+    async with _browser_pool_lock:
+        if _browser_pool is None:
+            pool = BrowserPool()
+            await pool.start()
+            _browser_pool = pool
+    return _browser_pool
+
+
+@lru_cache(maxsize=None)
+def session_browser_class():
+    from playwright.async_api import Browser
+
+    class SessionBrowser(Browser):
+        """Browser view limited to one session's context.
+        The playwright tools always use browser.contexts[0], so sharing a plain Browser would share pages across sessions."""
+
+        def __init__(self, browser, context):
+            super().__init__(browser._impl_obj)
+            self._session_context = context
+
+        @property
+        def contexts(self):
+            return [self._session_context]
+
+        async def new_context(self, **kwargs):
+            return self._session_context
+
+    return SessionBrowser
+
+
+class LazyTool(BaseTool):
+    """Advertised to the LLM right away, the real tool is only built by loader() on its first call"""
+    loader: Callable[[], Awaitable[BaseTool]]
+
+    @classmethod
+    def like(cls, tool_class, loader):
+        """take name, description and args schema from the real tool class without instantiating it"""
+        fields = tool_class.model_fields
+        return cls(name=fields["name"].default, description=fields["description"].default,
+                   args_schema=fields["args_schema"].default, loader=loader)
+
+    def _run(self, *args, **kwargs):
+        # the browser tools are bound to the event loop of the shared browser pool, so there is no safe
+        # way to run them from synchronous code (asyncio.run would start them on a throwaway loop)
+        raise ToolException(f"{self.name} only runs async, call it with ainvoke() from the event loop")
+
+    async def _arun(self, *args, **kwargs):
+        real_tool = await self.loader()
+        return await real_tool.ainvoke(args[0] if args and not kwargs else kwargs)
+
+
+class BrowserSession:
+    """browser tools of one session, a context is leased from the pool on the first browser tool call"""
+
+    def __init__(self):
+        self.pool = None
+        self.context = None
+        self.tools = None
+        self.closed = False
+        self.lock = asyncio.Lock()
+
+    async def get_tool(self, name):
+        async with self.lock:
+            if self.closed:
+                raise RuntimeError("browser session is closed")
+            if self.tools is None:
+                from langchain_community.agent_toolkits import PlayWrightBrowserToolkit
+                self.pool = await get_browser_pool()
+                self.context = await self.pool.acquire()
+                browser = session_browser_class()(self.context.browser, self.context)
+                toolkit = PlayWrightBrowserToolkit.from_browser(async_browser=browser)
+                self.tools = {t.name: t for t in toolkit.get_tools()}
+        return self.tools[name]
+
+    async def aclose(self):
+        """hand the context back to the pool, safe to call more than once"""
+        async with self.lock:
+            self.closed = True
+            self.tools = None
+            if self.context:
+                context, self.context = self.context, None
+                await self.pool.release(context)
+
 
 async def playwright_tools():
-    playwright = await async_playwright().start()
-    browser = await playwright.chromium.launch(headless=False)
-    toolkit = PlayWrightBrowserToolkit.from_browser(async_browser=browser)
-    return toolkit.get_tools(), browser, playwright
+    from langchain_community.tools.playwright import (
+        ClickTool, CurrentWebPageTool, ExtractHyperlinksTool, ExtractTextTool,
+        GetElementsTool, NavigateBackTool, NavigateTool,
+    )
+    session = BrowserSession()
+    tool_classes = [ClickTool, NavigateTool, NavigateBackTool, ExtractTextTool,
+                    ExtractHyperlinksTool, GetElementsTool, CurrentWebPageTool]
+    tools = []
+    for tool_class in tool_classes:
+        name = tool_class.model_fields["name"].default
+        tools.append(LazyTool.like(tool_class, lambda name=name: session.get_tool(name)))
+    return tools, session
 
 @tool("search")
-def tool_search(query: str) -> str:
+async def tool_search(query: str) -> str:
     """Use to perform external web search to retrieve information online"""
     print (f"Performing web search...")
-    return serper.run(query)
+    return await serper_search(query)
 
 @tool("push")
-def tool_push(msg: str):
+async def tool_push(msg: str) -> str:
     "Use this tool when asked to send notification or email or message to user's devices"
-    requests.post(pushover_url, data={"token": pushover_token, "user": pushover_user, "message": msg})
-    print (f"Message {msg[:5]} is pushed")
-    return 
+    # delivered in the background, the agent does not wait for the pushover round trip
+    if push_queue.submit(msg):
+        return "Notification queued"
+    return "Notification dropped, too many pending notifications"
 
 def get_file_tools():
+    from langchain_community.agent_toolkits import FileManagementToolkit
     toolkit = FileManagementToolkit(root_dir="sandbox")
     return toolkit.get_tools()
 
-async def other_tools():
-    """create and return list of other tools"""
+def python_repl_tool(session_id):
+    """python tool bound to one session, code runs in the shared pool of sandboxed interpreter processes"""
+    called = False
+
+    @tool("Python_REPL")
+    async def python_repl(command: str) -> str:
+        """A Python shell. Use this to execute python commands. Input should be a valid python command.
+        If you want to see the output of a value, you should print it out with `print(...)`."""
+        nonlocal called
+        pool = await get_repl_pool()  # interpreter processes start on the first python call in the process
+        # after an earlier call the model relies on its variables, tell it when they are gone
+        expect_state, called = called, True
+        return await pool.run(session_id, command, expect_state=expect_state)
+
+    return python_repl
+
+@lru_cache(maxsize=None)
+def wikipedia_tool():
+    from langchain_community.tools.wikipedia.tool import WikipediaQueryRun
+    from langchain_community.utilities.wikipedia import WikipediaAPIWrapper
+    return WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
+
+async def load_wikipedia_tool():
+    # stateless, one instance is shared by every session
+    return await asyncio.to_thread(wikipedia_tool)
+
+async def other_tools(session_id=None):
+    """create and return list of other tools, without a session_id the python tool gets a session of its own"""
+    session_id = session_id or str(uuid.uuid4())
+    from langchain_community.tools.wikipedia.tool import WikipediaQueryRun
     file_tools = get_file_tools()
-    wikipedia = WikipediaAPIWrapper()
-    tool_wiki = WikipediaQueryRun(api_wrapper=wikipedia)
-    python_repl = PythonREPLTool()
+    tool_wiki = LazyTool.like(WikipediaQueryRun, load_wikipedia_tool)
+    python_repl = python_repl_tool(session_id)
     return file_tools + [tool_push, tool_search, python_repl, tool_wiki]
 
 
-    
\ No newline at end of file
+# idempotent tools whose results only depend on their arguments.
+# browser tools act on the session's current page and push / file / python tools have side effects, never cached
+CACHEABLE_TOOLS = {"search", "wikipedia"}
+TOOL_CACHE_TTL = 15 * 60
+TOOL_CACHE_SIZE = 1024
+MAX_CONCURRENT_TOOL_CALLS = 4
+
+
+class TTLCache:
+    def __init__(self, ttl=TOOL_CACHE_TTL, maxsize=TOOL_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+# shared by every session in the process
+tool_cache = TTLCache()
+
+
+def normalize_args(args):
+    """same query with different case or spacing should hit the same cache entry"""
+    if isinstance(args, str):
+        return " ".join(args.lower().split())
+    if isinstance(args, dict):
+        return {k: normalize_args(v) for k, v in args.items()}
+    if isinstance(args, list):
+        return [normalize_args(v) for v in args]
+    return args
+
+
+class ToolExecutor:
+    """Graph node running the last message's tool calls concurrently (capped), with a TTL cache for idempotent tools"""
+
+    def __init__(self, tools, max_concurrency=MAX_CONCURRENT_TOOL_CALLS, cache=tool_cache, cacheable=CACHEABLE_TOOLS):
+        self.tools_by_name = {t.name: t for t in tools}
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.cache = cache
+        self.cacheable = cacheable
+        self.inflight = {}  # key -> Future, identical concurrent calls run once
+
+    async def __call__(self, state):
+        tool_calls = state["messages"][-1].tool_calls
+        messages = await asyncio.gather(*(self.run_tool_call(call) for call in tool_calls))
+        return {"messages": list(messages)}
+
+    async def run_tool_call(self, call):
+        tool = self.tools_by_name.get(call["name"])
+        if tool is None:
+            return ToolMessage(content=f"Error: {call['name']} is not a valid tool", name=call["name"],
+                               tool_call_id=call["id"], status="error")
+        if call["name"] not in self.cacheable:
+            content, status = await self.invoke(tool, call["args"])
+            return ToolMessage(content=content, name=call["name"], tool_call_id=call["id"], status=status)
+
+        key = call["name"] + ":" + json.dumps(normalize_args(call["args"]), sort_keys=True)
+        content = self.cache.get(key)
+        if content is None:
+            if key in self.inflight:
+                content, status = await asyncio.shield(self.inflight[key])
+            else:
+                future = asyncio.get_running_loop().create_future()
+                self.inflight[key] = future
+                try:
+                    content, status = await self.invoke(tool, call["args"])
+                    future.set_result((content, status))
+                finally:
+                    if not future.done():
+                        future.cancel()
+                    del self.inflight[key]
+                if status == "success":
+                    self.cache.set(key, content)
+        else:
+            status = "success"
+        return ToolMessage(content=content, name=call["name"], tool_call_id=call["id"], status=status)
+
+    async def invoke(self, tool, args):
+        async with self.semaphore:
+            try:
+                output = await tool.ainvoke(args)
+            except Exception as e:
+                # same as ToolNode's default error handling: the error goes back to the model
+                return f"Error: {e!r}\n Please fix your mistakes.", "error"
+        return output if isinstance(output, str) else str(output), "success"
+
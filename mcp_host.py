@@ -0,0 +1,67 @@
+"""Serve several FastMCP apps from one warm process.
+
+Each app is mounted over streamable HTTP at http://HOST:PORT/<name>/mcp, so clients reuse an
+already-running process (imports, DB connections, caches) instead of launching a server per call.
+
+    python mcp_host.py                      # all apps over HTTP
+    python mcp_host.py --stdio accounts     # one app over stdio, for clients that still launch a process
+"""
+import argparse
+import importlib
+from contextlib import AsyncExitStack, asynccontextmanager
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# name -> "module:attribute" of a FastMCP instance
+APPS = {
+    "ping": "tmp_mcp_server:mcp",
+    "accounts": "lab6b_mcp_custom.accounts_server:mcp",
+}
+
+
+def load_app(target: str):
+    module, attribute = target.split(":")
+    return getattr(importlib.import_module(module), attribute)
+
+
+def app_url(name: str, host: str = HOST, port: int = PORT) -> str:
+    return f"http://{host}:{port}/{name}/mcp"
+
+
+def build_host(apps: dict[str, str] = APPS) -> Starlette:
+    servers = {name: load_app(target) for name, target in apps.items()}
+    # streamable_http_app() creates the session manager that the lifespan below runs
+    routes = [Mount(f"/{name}", app=server.streamable_http_app()) for name, server in servers.items()]
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with AsyncExitStack() as stack:
+            for server in servers.values():
+                await stack.enter_async_context(server.session_manager.run())
+            yield
+
+    return Starlette(routes=routes, lifespan=lifespan)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="multiplexing host for FastMCP apps")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--stdio", metavar="APP", choices=sorted(APPS), help="serve one app over stdio instead")
+    args = parser.parse_args()
+
+    if args.stdio:
+        load_app(APPS[args.stdio]).run(transport="stdio")
+        return
+    for name in APPS:
+        print(f"{name}: {app_url(name, args.host, args.port)}")
+    uvicorn.run(build_host(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
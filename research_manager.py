@@ -3,6 +3,8 @@ from pydantic import BaseModel
 
 from agents import Agent, Runner
 
+from research_metrics import RunMetrics, span, record_usage
+
 NUMBER_OF_SEARCH = 3
 
 search_plan_instruction = f"""You are deep research assistant.
@@ -25,6 +27,7 @@ class WebSearchPlan(BaseModel):
 
 class PlannerAgent:
     def __init__(self, model: str = "gpt-4o-mini") -> None:
+        self.model = model
         self.agent = Agent(
             name="PlannerAgent",
             instructions=search_plan_instruction,
@@ -34,7 +37,9 @@ class PlannerAgent:
 
     async def plan_searches(self, query: str) -> WebSearchPlan:
         """Use planner_agent to plot out search terms."""
-        result = await Runner.run(self.agent, f"Query: {query}")
+        with span("plan"):
+            result = await Runner.run(self.agent, f"Query: {query}")
+            record_usage(result, self.model)
         return result.final_output
     
 
@@ -58,6 +63,7 @@ The summary will be sonsumed by someone synthesizing a full report, so it is vit
 
 class SearchAgent:
     def __init__(self, model: str = "gpt-4o-mini") -> None:
+        self.model = model
         self._search_tool_perplexity = PerplexitySearchTool()
 
         search_tool = self._search_tool_perplexity
@@ -87,20 +93,39 @@ class SearchAgent:
             f"Search term: {item.query} \n "
             f"Search strategy reasoning: {item.reason}"
         )
-        result = await Runner.run(self.agent, input_text)
+        with span("search.query", query=item.query):
+            result = await Runner.run(self.agent, input_text)
+            record_usage(result, self.model)
         return result.final_output
 
     async def perform_searches(self, search_plan: WebSearchPlan) -> List[str]:
         """Call search() for each search item in search plan."""
-        tasks = [asyncio.create_task(self._search(item)) for item in search_plan.searches]
-        results = await asyncio.gather(*tasks)
+        with span("search", searches=len(search_plan.searches)):
+            tasks = [asyncio.create_task(self._search(item)) for item in search_plan.searches]
+            results = await asyncio.gather(*tasks)
         return list(results)
 
-from typing import List
+import re
+import json
+import time
+import asyncio
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Union
 
 from pydantic import BaseModel
 
-from agents import Agent, Runner
+from agents import Agent, Runner, custom_span
+from openai.types.responses import ResponseTextDeltaEvent
+
+try:
+    import tiktoken
+except ImportError:  # fall back to a character based estimate
+    tiktoken = None
+
+REPORT_TOKEN_BUDGET = 6000
+COMPACT_MAX_CONCURRENCY = 4   # summarize calls in flight during the map step
+COMPACT_MIN_SHARE = 400       # smallest per-call token share; more notes are merged into groups instead
 
 
 search_exec_instruction = """You are researcher taksed with writing cohesive report for a research query. 
@@ -122,27 +147,270 @@ class ReportData(BaseModel):
     """Suggested topics to research further"""
 
 
+compact_instruction = """You compress research notes for a report writer.
+Given summarized search results, rewrite them as dense notes within the requested token limit.
+Keep every fact, figure, name and source. Drop repetition, fluff and commentary."""
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Count tokens locally, roughly 4 characters per token when tiktoken is missing."""
+    if tiktoken is None:
+        return (len(text) + 3) // 4
+    # web text may contain special-token strings like <|endoftext|>, count them as plain text
+    return len(_encoding(model).encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> str:
+    """Hard cut of text to at most max_tokens tokens."""
+    if tiktoken is None:
+        return text[: max_tokens * 4]
+    tokens = _encoding(model).encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return _encoding(model).decode(tokens[:max_tokens])
+
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+def group_notes(notes: List[str], groups: int, model: str = "gpt-4o-mini") -> List[str]:
+    """Merge consecutive notes into at most `groups` chunks of roughly equal token size."""
+    sizes = [count_tokens(note, model) for note in notes]
+    target = sum(sizes) / groups
+    chunks: List[List[str]] = [[]]
+    seen = 0
+    for note, size in zip(notes, sizes):
+        # start the next chunk once most of this note would spill past the current chunk's end
+        if chunks[-1] and seen + size / 2 > len(chunks) * target and len(chunks) < groups:
+            chunks.append([])
+        chunks[-1].append(note)
+        seen += size
+    return ["\n\n".join(chunk) for chunk in chunks]
+
+
+def dedupe_sentences(summaries: List[str]) -> List[str]:
+    """Drop sentences already seen in an earlier summary (or earlier in the same one)."""
+    seen = set()
+    deduped = []
+    for summary in summaries:
+        lines = []
+        for line in summary.splitlines():
+            kept = []
+            for sentence in _SENTENCE_SPLIT.split(line.strip()):
+                key = " ".join(re.sub(r"[^\w\s]", "", sentence.lower()).split())
+                if not key:
+                    continue
+                if key in seen:
+                    continue
+                seen.add(key)
+                kept.append(sentence)
+            if kept:
+                lines.append(" ".join(kept))
+        if lines:
+            deduped.append("\n".join(lines))
+    return deduped
+
+
+class ContextCompactor:
+    """Keep the writer input under a token budget, however many searches ran."""
+
+    def __init__(self, model: str = "gpt-4o-mini", token_budget: int = REPORT_TOKEN_BUDGET) -> None:
+        self.model = model
+        self.token_budget = token_budget
+        self.agent = Agent(
+            name="CompactorAgent",
+            instructions=compact_instruction,
+            model=model,
+        )
+
+    async def _summarize(self, text: str, max_tokens: int, limit: Optional[asyncio.Semaphore] = None) -> str:
+        input_text = f"Token limit: {max_tokens}\n\nNotes:\n{text}"
+        async with limit or nullcontext():
+            with span("compact.summarize", max_tokens=max_tokens):
+                result = await Runner.run(self.agent, input_text)
+                record_usage(result, self.model)
+        return truncate_to_tokens(result.final_output, max_tokens, self.model)
+
+    async def compact(self, search_results: List[str]) -> str:
+        """Dedupe, then map-reduce summarize when the results exceed the token budget."""
+        with custom_span("Compact search results") as trace_span, span("compact") as metrics_span:
+            tokens_in = sum(count_tokens(r, self.model) for r in search_results)
+            notes = dedupe_sentences(search_results)
+            tokens_deduped = sum(count_tokens(n, self.model) for n in notes)
+
+            map_calls = 0
+            reduced = False
+            if tokens_deduped > self.token_budget and notes:
+                # map: shrink each group of notes to its share of the budget; with many notes they are
+                # merged into fewer groups so no share gets too small to keep anything
+                groups = max(1, min(len(notes), self.token_budget // COMPACT_MIN_SHARE))
+                notes = group_notes(notes, groups, self.model)
+                share = self.token_budget // len(notes)
+                limit = asyncio.Semaphore(COMPACT_MAX_CONCURRENCY)
+                tasks = []
+                for note in notes:
+                    if count_tokens(note, self.model) > share:
+                        tasks.append(self._summarize(note, share, limit))
+                        map_calls += 1
+                    else:
+                        tasks.append(asyncio.sleep(0, result=note))
+                notes = list(await asyncio.gather(*tasks))
+
+            text = "\n\n".join(f"[{i + 1}] {note}" for i, note in enumerate(notes))
+            if count_tokens(text, self.model) > self.token_budget:
+                # reduce: merge the mapped notes into one summary within budget
+                text = await self._summarize(text, self.token_budget)
+                reduced = True
+
+            tokens_out = count_tokens(text, self.model)
+            stats = {
+                "token_budget": self.token_budget,
+                "search_results": len(search_results),
+                "tokens_in": tokens_in,
+                "tokens_deduped": tokens_deduped,
+                "tokens_out": tokens_out,
+                "map_calls": map_calls,
+                "reduced": reduced,
+            }
+            trace_span.span_data.data.update(stats)
+            metrics_span["attributes"].update(stats)
+        print(f"Compacted search results: {tokens_in} -> {tokens_out} tokens (budget {self.token_budget})")
+        return text
+
+
 class DeepResearch:
-    def __init__(self, model: str = "gpt-4o-mini") -> None:
+    def __init__(self, model: str = "gpt-4o-mini", token_budget: int = REPORT_TOKEN_BUDGET) -> None:
+        self.model = model
         self.agent = Agent(
             name="WriterAgent",
             instructions=search_exec_instruction,
             model=model,
             output_type=ReportData,
         )
+        self.compactor = ContextCompactor(model=model, token_budget=token_budget)
 
     async def write_report(self, query: str, search_results: List[str]) -> ReportData:
         """Use writer agent to write a report based on the search results."""
         print("Thinking about the report..")
+        notes = await self.compactor.compact(search_results)
         input_text = (
-            f"Original query: {query}\n summarized search results: {search_results}"
+            f"Original query: {query}\n summarized search results:\n{notes}"
         )
-        result = await Runner.run(self.agent, input_text)
+        with span("write"):
+            result = await Runner.run(self.agent, input_text)
+            record_usage(result, self.model)
         print("Finished writing report")
         return result.final_output
 
-
-from typing import Dict
+    async def stream_report(
+        self, query: str, search_results: List[str]
+    ) -> AsyncIterator[Union[str, ReportData]]:
+        """Stream markdown deltas of the report as they are generated, then yield the final ReportData."""
+        print("Thinking about the report..")
+        notes = await self.compactor.compact(search_results)
+        input_text = (
+            f"Original query: {query}\n summarized search results:\n{notes}"
+        )
+        with custom_span("Stream report") as trace_span, span("write") as metrics_span:
+            start = time.perf_counter()
+            first_token_at = None
+            # the writer emits ReportData as JSON, pull the markdown_report field out of the partial JSON
+            markdown = PartialJsonString("markdown_report")
+            result = Runner.run_streamed(self.agent, input_text)
+            async for event in result.stream_events():
+                if event.type != "raw_response_event" or not isinstance(event.data, ResponseTextDeltaEvent):
+                    continue
+                delta = markdown.feed(event.data.delta)
+                if delta:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    yield delta
+            total = time.perf_counter() - start
+            ttft = (first_token_at - start) if first_token_at is not None else total
+            timings = {"time_to_first_token_s": round(ttft, 3), "generation_time_s": round(total, 3)}
+            trace_span.span_data.data.update(timings)
+            metrics_span["attributes"].update(timings)
+            record_usage(result, self.model)
+        print(f"Finished writing report (first token {ttft:.2f}s, total {total:.2f}s)")
+        yield result.final_output
+
+
+class PartialJsonString:
+    """Incrementally decode the string value of one key from JSON arriving in chunks.
+
+    Only the new text is scanned on each feed(), so a long report costs linear time overall.
+    """
+
+    _SPECIAL = re.compile(r'["\\]')
+
+    def __init__(self, key: str) -> None:
+        self._literal = json.dumps(key)
+        self._key = re.compile(r'%s\s*:\s*"' % re.escape(self._literal))
+        self._head = ""       # text before the value, until the key is found
+        self._search_from = 0
+        self._pending = ""    # undecoded tail of the value (an incomplete escape sequence)
+        self.started = False
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        """Add a chunk of JSON, return the newly decoded part of the value."""
+        if self.done:
+            return ""
+        if not self.started:
+            self._head += chunk
+            match = self._key.search(self._head, self._search_from)
+            if not match:
+                # the key can straddle chunks, rescan from its last partial occurrence next time
+                last = self._head.rfind(self._literal, self._search_from)
+                self._search_from = last if last >= 0 else max(0, len(self._head) - len(self._literal))
+                return ""
+            self.started = True
+            chunk, self._head = self._head[match.end():], ""
+        return self._decode(self._pending + chunk)
+
+    def _decode(self, text: str) -> str:
+        out = []
+        i, n = 0, len(text)
+        while i < n:
+            match = self._SPECIAL.search(text, i)
+            if match is None:
+                out.append(text[i:])
+                i = n
+                break
+            j = match.start()
+            out.append(text[i:j])
+            if text[j] == '"':
+                self.done = True
+                i = n
+                break
+            # keep only complete escape sequences, and both halves of a surrogate pair
+            width = 6 if text[j + 1:j + 2] == "u" else 2
+            if width == 6 and j + 6 <= n and "\ud800" <= json.loads('"' + text[j:j + 6] + '"') <= "\udbff":
+                width = 12
+            if j + width > n:
+                i = j
+                break
+            out.append(json.loads('"' + text[j:j + width] + '"'))
+            i = j + width
+        self._pending = "" if self.done else text[i:]
+        return "".join(out)
+
+
+import time
+import uuid
+import sqlite3
+import asyncio
+import hashlib
+import contextvars
+from typing import Dict, Optional
 
 from agents import Agent, Runner, function_tool
 
@@ -163,24 +431,34 @@ Then, use the html_converter tool to convert to body to HTML.
 Finally, use send_html_email tool to send out the email with subject and HTML body."""
 
 
+def _send_html_email(subject: str, html_body: str) -> Dict[str, str]:
+    print("pretending to send an html email")
+    print("sending....")
+    print(f"\n\n#############{subject}###########\n\n")
+    print(f"\n\n#############{html_body}###########\n\n")
+    print("done!")
+    return {"status": "success"}
+
+
 class EmailAgent:
     def __init__(self, model: str = "gpt-4o-mini") -> None:
-        subject_writer = Agent(
+        self.model = model
+        self.subject_writer = Agent(
             name="Email subject writer",
             instructions=subject_instruction,
             model=model,
         )
-        subject_tool = subject_writer.as_tool(
+        subject_tool = self.subject_writer.as_tool(
             tool_name="subject_writer",
             tool_description="Write a subject for a cold sales email",
         )
 
-        html_converter = Agent(
+        self.html_converter = Agent(
             name="HTML email body converter",
             instructions=html_instruction,
             model=model,
         )
-        html_tool = html_converter.as_tool(
+        html_tool = self.html_converter.as_tool(
             tool_name="html_converter",
             tool_description="Convert a text email body to an HTML email body",
         )
@@ -188,12 +466,7 @@ class EmailAgent:
         @function_tool
         def send_html_email(subject: str, html_body: str) -> Dict[str, str]:
             """Send out an email with given subject and HTML body to all sales prospect."""
-            print("pretending to send an html email")
-            print("sending....")
-            print(f"\n\n#############{subject}###########\n\n")
-            print(f"\n\n#############{html_body}###########\n\n")
-            print("done!")
-            return {"status": "success"}
+            return _send_html_email(subject, html_body)
 
         self.agent = Agent(
             name="Email Manager",
@@ -206,40 +479,251 @@ class EmailAgent:
         # Optional: keep a convenience attribute matching old pattern if you used it
         self.tools = [subject_tool, html_tool, send_html_email]
 
+    async def deliver(self, body: str) -> Dict[str, str]:
+        """Write subject and HTML body in parallel, then send the email."""
+        with span("email.compose"):
+            subject_result, html_result = await asyncio.gather(
+                Runner.run(self.subject_writer, body),
+                Runner.run(self.html_converter, body),
+            )
+            record_usage(subject_result, self.model)
+            record_usage(html_result, self.model)
+        with span("email.send"):
+            return await asyncio.to_thread(
+                _send_html_email, subject_result.final_output, html_result.final_output
+            )
+
     async def send_email(self, report: ReportData) -> ReportData:
         """Use email agent to send email."""
         print("writing email...")
-        await Runner.run(self.agent, report.markdown_report)
+        await self.deliver(report.markdown_report)
         print("Email sent")
         return report
 
+
+EMAIL_QUEUE_DB = "email_queue.db"
+EMAIL_MAX_ATTEMPTS = 5
+EMAIL_RETRY_BACKOFF = 2.0
+EMAIL_CLAIM_LEASE = 300.0
+EMAIL_DRAIN_TIMEOUT = 120.0
+
+
+class EmailQueue:
+    """Durable SQLite queue of pending emails, keyed by an idempotency key."""
+
+    def __init__(self, db: str = EMAIL_QUEUE_DB, max_attempts: int = EMAIL_MAX_ATTEMPTS) -> None:
+        self.db = db
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS email_jobs (
+                    id TEXT PRIMARY KEY,
+                    body TEXT,
+                    status TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    last_error TEXT,
+                    available_at REAL,
+                    created_at REAL,
+                    updated_at REAL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS email_jobs_pending ON email_jobs (status, available_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db, timeout=30, isolation_level=None)
+
+    @staticmethod
+    def idempotency_key(body: str) -> str:
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    def enqueue(self, body: str, key: Optional[str] = None) -> str:
+        """Queue an email; enqueueing the same key twice only sends it once."""
+        key = key or self.idempotency_key(body)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO email_jobs (id, body, status, attempts, available_at, created_at, updated_at)
+                VALUES (?, ?, 'pending', 0, ?, ?, ?)
+            ''', (key, body, now, now, now))
+        return key
+
+    def claim(self) -> Optional[tuple[str, str, float]]:
+        """Atomically take the next due job, returns (key, body, available_at) or None."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # a 'sending' job whose lease expired belonged to a worker that died, hand it out again
+            row = conn.execute('''
+                SELECT id, body, available_at FROM email_jobs
+                WHERE (status = 'pending' AND available_at <= ?)
+                   OR (status = 'sending' AND updated_at <= ?)
+                ORDER BY available_at LIMIT 1
+            ''', (now, now - EMAIL_CLAIM_LEASE)).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE email_jobs SET status = 'sending', updated_at = ? WHERE id = ?", (now, row[0])
+                )
+            conn.execute("COMMIT")
+            return row
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def complete(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE email_jobs SET status = 'sent', last_error = NULL, updated_at = ? WHERE id = ?",
+                (time.time(), key),
+            )
+
+    def fail(self, key: str, error: str) -> None:
+        """Reschedule with exponential backoff, or give up after max_attempts."""
+        now = time.time()
+        with self._connect() as conn:
+            attempts = conn.execute("SELECT attempts FROM email_jobs WHERE id = ?", (key,)).fetchone()[0] + 1
+            status = "failed" if attempts >= self.max_attempts else "pending"
+            conn.execute('''
+                UPDATE email_jobs SET status = ?, attempts = ?, last_error = ?, available_at = ?, updated_at = ?
+                WHERE id = ?
+            ''', (status, attempts, error, now + EMAIL_RETRY_BACKOFF ** attempts, now, key))
+
+    def status(self, key: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT status FROM email_jobs WHERE id = ?", (key,)).fetchone()
+            return row[0] if row else None
+
+
+class EmailWorkerPool:
+    """Background asyncio workers that drain the EmailQueue off the request path."""
+
+    def __init__(self, email_agent: EmailAgent, queue: EmailQueue, workers: int = 2, poll_interval: float = 1.0) -> None:
+        self.email_agent = email_agent
+        self.queue = queue
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tasks: list[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._submitted: set[str] = set()
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # a new event loop (e.g. a second asyncio.run): the old workers and event died with the old one
+            self._loop, self._wakeup, self._tasks = loop, asyncio.Event(), []
+        self._tasks = [t for t in self._tasks if not t.done()]
+        for _ in range(self.workers - len(self._tasks)):
+            # empty context: workers outlive the request that started them, so they must not inherit
+            # its trace or metrics span
+            self._tasks.append(contextvars.Context().run(asyncio.create_task, self._work()))
+
+    async def submit(self, report: ReportData) -> str:
+        """Queue the report email and return immediately."""
+        key = await asyncio.to_thread(self.queue.enqueue, report.markdown_report)
+        self._submitted.add(key)
+        self.start()
+        self._wakeup.set()
+        print(f"Email queued ({key[:8]})")
+        return key
+
+    async def drain(self, timeout: float = EMAIL_DRAIN_TIMEOUT) -> bool:
+        """Wait until every email submitted here was sent or gave up; False if the timeout hit first."""
+        deadline = time.time() + timeout
+        while self._submitted:
+            for key in list(self._submitted):
+                if await asyncio.to_thread(self.queue.status, key) not in ("pending", "sending"):
+                    self._submitted.discard(key)
+            if self._submitted:
+                if time.time() >= deadline:
+                    return False
+                await asyncio.sleep(min(self.poll_interval, 0.2))
+        return True
+
+    async def _work(self) -> None:
+        worker_id = uuid.uuid4().hex[:6]
+        while True:
+            job = await asyncio.to_thread(self.queue.claim)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            key, body, available_at = job
+            try:
+                print(f"[email worker {worker_id}] sending {key[:8]}")
+                with RunMetrics("email").activate() as root:
+                    root["attributes"]["queue_wait_s"] = max(time.time() - available_at, 0.0)
+                    await self.email_agent.deliver(body)
+                await asyncio.to_thread(self.queue.complete, key)
+            except asyncio.CancelledError:
+                await asyncio.to_thread(self.queue.fail, key, "cancelled")
+                raise
+            except Exception as e:
+                print(f"[email worker {worker_id}] failed {key[:8]}: {e}")
+                await asyncio.to_thread(self.queue.fail, key, repr(e))
+
+    async def stop(self) -> None:
+        """Cancel the workers; an email cancelled mid-send stays queued and is retried by the next worker."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+@lru_cache(maxsize=None)
+def shared_email_workers() -> EmailWorkerPool:
+    """The one email queue and worker pool of this process, shared by every ResearchManager."""
+    return EmailWorkerPool(EmailAgent(), EmailQueue())
+
 from agents import trace
 
 class ResearchManager:
-    """Minimal entry to run the whole research → report → email flow."""
+    """Minimal entry to run the whole research → report → email flow.
+
+    Emails are sent by background workers shared by all managers in the process, so creating a
+    manager per request is cheap. Scripts that end the event loop right after run() (asyncio.run)
+    must await aclose() first, or the email is only sent by a later process.
+    """
 
     def __init__(self) -> None:
         self.planner = PlannerAgent()
         self.search_agent = SearchAgent()
         self.deep_research = DeepResearch()
-        self.email_agent = EmailAgent()
+        self.email_workers = shared_email_workers()
+        self.email_agent = self.email_workers.email_agent
 
     async def run(self, query: str) -> ReportData:
-        """Full pipeline: plan searches, execute, write report, send email."""
-        with trace("Research trace planned-write-email"):
+        """Full pipeline: plan searches, execute, write report, queue email in the background."""
+        with trace("Research trace planned-write-email"), RunMetrics("research").activate():
             print("Starting search")
 
             search_plan: WebSearchPlan = await self.planner.plan_searches(query)
             search_result = await self.search_agent.perform_searches(search_plan)
             report = await self.deep_research.write_report(query, search_result)
-            await self.email_agent.send_email(report)
+            with span("email.enqueue"):
+                await self.email_workers.submit(report)
 
             print("Done!")
             return report
 
+    async def aclose(self, timeout: float = EMAIL_DRAIN_TIMEOUT) -> None:
+        """Wait for the emails queued in this process, then stop the shared email workers.
+
+        A later run() starts them again.
+        """
+        if not await self.email_workers.drain(timeout):
+            print("Emails still queued, they will be sent by the next run")
+        await self.email_workers.stop()
+
     async def stream(self, query: str):
         """Async generator that yields progress + final report."""
-        with trace("Research trace planned-write-email"):
+        with trace("Research trace planned-write-email"), RunMetrics("research").activate():
             yield "Planning searches..."
             search_plan: WebSearchPlan = await self.planner.plan_searches(query)
 
@@ -247,10 +731,17 @@ class ResearchManager:
             search_result = await self.search_agent.perform_searches(search_plan)
 
             yield "Writing report..."
-            report = await self.deep_research.write_report(query, search_result)
-
-            yield "Sending email..."
-            await self.email_agent.send_email(report)
+            markdown = ""
+            async for chunk in self.deep_research.stream_report(query, search_result):
+                if isinstance(chunk, ReportData):
+                    report = chunk
+                    continue
+                # gradio replaces the output on every yield, so send the report written so far
+                markdown += chunk
+                yield markdown
+
+            with span("email.enqueue"):
+                await self.email_workers.submit(report)
 
             yield "Done! Here is the report:\n\n" + report.markdown_report
 
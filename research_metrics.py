@@ -0,0 +1,231 @@
+"""Per-stage latency, token and cost instrumentation for the research pipeline.
+
+Spans are written as OpenTelemetry-style JSON lines to SPANS_FILE and the latest
+run of each kind is also written in Prometheus text format to PROM_FILE.
+
+Regression check against a stored p95 baseline. The baseline remembers the newest span it
+covers; the check only looks at spans recorded after it, so past runs do not dilute a regression:
+    python research_metrics.py --baseline research_baseline.json --update   # take the baseline
+    python research_metrics.py --baseline research_baseline.json            # check the runs since
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+SPANS_FILE = "research_spans.jsonl"
+PROM_FILE = "research_metrics_{run}.prom"
+
+# USD per 1M (input, output) tokens
+MODEL_PRICING = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+_current_run: ContextVar[Optional["RunMetrics"]] = ContextVar("current_run", default=None)
+_current_span: ContextVar[Optional[Dict[str, Any]]] = ContextVar("current_span", default=None)
+
+
+class RunMetrics:
+    """Collects the spans of one pipeline run."""
+
+    def __init__(self, name: str, spans_file: str = SPANS_FILE, prom_file: Optional[str] = PROM_FILE) -> None:
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Dict[str, Any]] = []
+        self.spans_file = spans_file
+        self.prom_file = prom_file
+
+    @contextmanager
+    def activate(self):
+        """Make this run the target of span() and record_usage() in the current context."""
+        token = _current_run.set(self)
+        try:
+            with span(self.name) as root:
+                yield root
+        finally:
+            _current_run.reset(token)
+            self.export()
+
+    def totals(self) -> Dict[str, Dict[str, float]]:
+        """Aggregate duration, tokens, tool calls and cost per span name."""
+        totals: Dict[str, Dict[str, float]] = {}
+        for s in self.spans:
+            row = totals.setdefault(s["name"], {"count": 0, "duration_s": 0.0, "input_tokens": 0,
+                                                "output_tokens": 0, "tool_calls": 0, "cost_usd": 0.0})
+            attrs = s["attributes"]
+            row["count"] += 1
+            row["duration_s"] += (s["end_time_unix_nano"] - s["start_time_unix_nano"]) / 1e9
+            for key in ("input_tokens", "output_tokens", "tool_calls", "cost_usd"):
+                row[key] += attrs.get(key, 0)
+        return totals
+
+    def summary_table(self) -> str:
+        header = f"{'stage':<24}{'n':>4}{'seconds':>10}{'in tok':>9}{'out tok':>9}{'tools':>7}{'cost $':>10}"
+        lines = [header, "-" * len(header)]
+        for name, row in self.totals().items():
+            lines.append(
+                f"{name:<24}{row['count']:>4}{row['duration_s']:>10.2f}{row['input_tokens']:>9}"
+                f"{row['output_tokens']:>9}{row['tool_calls']:>7}{row['cost_usd']:>10.5f}"
+            )
+        return "\n".join(lines)
+
+    def prometheus(self) -> str:
+        lines = []
+        metrics = {
+            "research_stage_duration_seconds": "duration_s",
+            "research_stage_input_tokens": "input_tokens",
+            "research_stage_output_tokens": "output_tokens",
+            "research_stage_tool_calls": "tool_calls",
+            "research_stage_cost_usd": "cost_usd",
+        }
+        totals = self.totals()
+        for metric, key in metrics.items():
+            lines.append(f"# TYPE {metric} gauge")
+            for name, row in totals.items():
+                lines.append(f'{metric}{{run="{self.name}",stage="{name}"}} {row[key]}')
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> None:
+        with open(self.spans_file, "a") as f:
+            for s in self.spans:
+                f.write(json.dumps(s) + "\n")
+        if self.prom_file:
+            with open(self.prom_file.format(run=self.name), "w") as f:
+                f.write(self.prometheus())
+        print(self.summary_table())
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block as a child of the current span. No-op outside RunMetrics.activate()."""
+    run = _current_run.get()
+    if run is None:
+        yield {"attributes": dict(attributes)}
+        return
+    parent = _current_span.get()
+    record = {
+        "trace_id": run.trace_id,
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_span_id": parent["span_id"] if parent else None,
+        "name": name,
+        "start_time_unix_nano": time.time_ns(),
+        "end_time_unix_nano": None,
+        "attributes": dict(attributes),
+        "status": "OK",
+    }
+    token = _current_span.set(record)
+    try:
+        yield record
+    except BaseException as e:
+        record["status"] = "ERROR"
+        record["attributes"]["error"] = repr(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        record["end_time_unix_nano"] = time.time_ns()
+        run.spans.append(record)
+
+
+def record_usage(result, model: str = "gpt-4o-mini") -> None:
+    """Add token usage, tool-call count and cost of a Runner result to the current span."""
+    record = _current_span.get()
+    if record is None:
+        return
+    usage = result.context_wrapper.usage
+    tool_calls = sum(1 for item in result.new_items if item.type == "tool_call_item")
+    input_price, output_price = MODEL_PRICING.get(model, (0.0, 0.0))
+    attrs = record["attributes"]
+    attrs["llm_requests"] = attrs.get("llm_requests", 0) + usage.requests
+    attrs["input_tokens"] = attrs.get("input_tokens", 0) + usage.input_tokens
+    attrs["output_tokens"] = attrs.get("output_tokens", 0) + usage.output_tokens
+    attrs["tool_calls"] = attrs.get("tool_calls", 0) + tool_calls
+    attrs["cost_usd"] = attrs.get("cost_usd", 0.0) + (
+        usage.input_tokens * input_price + usage.output_tokens * output_price
+    ) / 1e6
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def read_spans(spans_file: str = SPANS_FILE, after_unix_nano: int = 0) -> List[Dict[str, Any]]:
+    """OK spans that ended after the given time."""
+    spans = []
+    with open(spans_file) as f:
+        for line in f:
+            s = json.loads(line)
+            if s["status"] == "OK" and s["end_time_unix_nano"] > after_unix_nano:
+                spans.append(s)
+    return spans
+
+
+def stage_p95(spans: List[Dict[str, Any]]) -> Dict[str, float]:
+    durations: Dict[str, List[float]] = {}
+    for s in spans:
+        durations.setdefault(s["name"], []).append(
+            (s["end_time_unix_nano"] - s["start_time_unix_nano"]) / 1e9
+        )
+    return {name: percentile(values, 0.95) for name, values in durations.items()}
+
+
+def check_regression(baseline: Dict[str, float], current: Dict[str, float], tolerance: float = 0.2) -> List[str]:
+    """Return the stages whose p95 grew by more than tolerance over the baseline."""
+    regressions = []
+    for name, base in baseline.items():
+        if name in current and current[name] > base * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current[name]:.2f}s > baseline {base:.2f}s (+{tolerance:.0%})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare research pipeline stage p95 against a baseline")
+    parser.add_argument("--spans", default=SPANS_FILE)
+    parser.add_argument("--baseline", required=True)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--update", action="store_true",
+                        help="write the baseline from the spans since the previous baseline (all spans if none)")
+    args = parser.parse_args()
+
+    previous = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            previous = json.load(f)
+    elif not args.update:
+        print(f"No baseline at {args.baseline}, create it with --update")
+        return 2
+    spans = read_spans(args.spans, previous["until_unix_nano"] if previous else 0)
+
+    if args.update:
+        if not spans:
+            print("No spans to take a baseline from")
+            return 2
+        with open(args.baseline, "w") as f:
+            json.dump({"until_unix_nano": max(s["end_time_unix_nano"] for s in spans),
+                       "p95": stage_p95(spans)}, f, indent=2)
+        print(f"Baseline written to {args.baseline} from {len(spans)} spans")
+        return 0
+
+    if not spans:
+        print("No spans recorded since the baseline was taken")
+        return 2
+    baseline = previous["p95"]
+    current = stage_p95(spans)
+    print(f"{len(spans)} spans since the baseline")
+    for name, value in sorted(current.items()):
+        print(f"{name:<24} p95 {value:8.2f}s  baseline {baseline.get(name, float('nan')):8.2f}s")
+    regressions = check_regression(baseline, current, args.tolerance)
+    for line in regressions:
+        print("REGRESSION " + line)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())